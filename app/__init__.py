@@ -23,9 +23,9 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_smorest import Api
 from redis import Redis
-import rq
 from app import config
 import logging
+import gc
 
 app = Flask(__name__)
 app.config.from_object(Config)
@@ -33,13 +33,19 @@ db = SQLAlchemy(app)
 migrate = Migrate(app, db)
 api = Api(app)
 
-from app import routes, result_model, errors
+from app import routes, result_model, profile_model, errors, job_queues
 
 api.register_blueprint(routes.blp)
 app.redis = Redis.from_url(app.config['REDIS_URL'], port=5040)
-app.execute_queue = rq.Queue('braket-service_execute', connection=app.redis, default_timeout=3600)
+app.execute_queues = job_queues.create(app.redis)
 app.logger.setLevel(logging.INFO)
 
+if app.config['GUNICORN_PRELOAD']:
+    from app import braket_handler, implementation_handler
+    # keep the garbage collector from touching the preloaded objects, which would copy their pages in every worker
+    gc.freeze()
+
+
 @app.route("/")
 def heartbeat():
     return '<h1>BraketService is running</h1> <h3>View the API Docs <a href="/api/swagger-ui">here</a></h3>'
\ No newline at end of file
@@ -0,0 +1,155 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+import hashlib
+import math
+import time
+
+from rq import Worker
+from rq.job import Job, JobStatus
+from werkzeug.exceptions import TooManyRequests
+
+from app import app
+
+_KEY_PREFIX = "braket-service:admission:"
+# estimated seconds of work of every admitted job that has not finished yet, and their sum
+_WORK = _KEY_PREFIX + "work"
+_WORK_TOTAL = _KEY_PREFIX + "work-total"
+# tenants that requested executions recently, scored by the time of their latest request
+_TENANTS = _KEY_PREFIX + "tenants"
+# addresses that requested executions recently, which limit how many tenants count for the shares
+_ADDRESSES = _KEY_PREFIX + "addresses"
+_RECONCILED = _KEY_PREFIX + "reconciled"
+
+# jobs in these states still hold their estimated work
+_OUTSTANDING = (JobStatus.QUEUED, JobStatus.STARTED, JobStatus.DEFERRED, JobStatus.SCHEDULED)
+
+
+def tenant_of(bearer_token, token, address):
+    """Return the tenant of a request, identified by its bearer token, its AWS token, or its address."""
+    return hashlib.sha256(str(bearer_token or token or address or "").encode("utf-8")).hexdigest()[:32]
+
+
+def admit(tenant, address, estimate):
+    """Admit a job with the estimated cost or raise a TooManyRequests error, whose retry_after tells when the request
+    may succeed. Jobs are rejected while too many jobs are queued or the estimated work of the admitted jobs is more
+    than the workers can do within ADMISSION_MAX_WORK_PER_WORKER seconds, and tenants that used up their share of the
+    workers are rejected before the others. The address of the request limits how many tenants share the workers.
+    Returns the cost, which is passed to track once the job is queued."""
+    if not app.config['ADMISSION_CONTROL']:
+        return 0
+    cost = max(estimate.seconds + (app.config['SMALL_JOB_MAX_SECONDS'] if estimate.partial else 0),
+               app.config['ADMISSION_MIN_COST'])
+    workers = max(Worker.count(connection=app.redis), 1)
+
+    depth = sum(len(queue) for queue in app.execute_queues.values())
+    work = float(app.redis.get(_WORK_TOTAL) or 0)
+    max_depth = app.config['ADMISSION_MAX_QUEUE_DEPTH']
+    max_work = app.config['ADMISSION_MAX_WORK_PER_WORKER'] * workers
+    # a job is admitted into idle workers even if it costs more than the limit
+    if (depth >= max_depth or 0 < work and work + cost > max_work) and _reconcile():
+        work = float(app.redis.get(_WORK_TOTAL) or 0)
+    if depth >= max_depth:
+        # the surplus jobs are expected to take as long as the average admitted job
+        _reject("Too many jobs are queued.", (depth - max_depth + 1) * work / max(depth, 1) / workers)
+    if 0 < work and work + cost > max_work:
+        _reject("The queued jobs keep the workers busy for too long.", (work + cost - max_work) / workers)
+
+    retry_after = _take(tenant, address, cost, workers)
+    if retry_after > 0:
+        _reject("The share of the workers of the tenant is used up.", retry_after)
+    return cost
+
+
+def track(job_id, cost):
+    """Count the estimated work of an admitted job as outstanding until it is finished."""
+    if not cost:
+        return
+    pipeline = app.redis.pipeline()
+    pipeline.hset(_WORK, job_id, cost)
+    pipeline.incrbyfloat(_WORK_TOTAL, cost)
+    pipeline.execute()
+
+
+def cost_of(job_id):
+    """Return the estimated work of a job that is still outstanding, 0 if it is not tracked."""
+    return float(app.redis.hget(_WORK, job_id) or 0)
+
+
+def finished(job_id):
+    """Release the estimated work of a job that finished, failed or was canceled."""
+    cost = app.redis.hget(_WORK, job_id)
+    if cost is not None and app.redis.hdel(_WORK, job_id):
+        app.redis.incrbyfloat(_WORK_TOTAL, -float(cost))
+
+
+def _reject(message, retry_after):
+    error = TooManyRequests(message)
+    error.retry_after = max(int(math.ceil(retry_after)), 1)
+    raise error
+
+
+def _take(tenant, address, cost, workers):
+    """Take the cost from the token bucket of the tenant and return 0, or the seconds until it holds enough tokens.
+    The buckets hold seconds of work and are refilled with the capacity of the workers, which is shared equally by
+    all tenants that requested executions within ADMISSION_TENANT_WINDOW seconds. Every address counts for at most
+    ADMISSION_TENANTS_PER_ADDRESS tenants on average, so a client cannot shrink the shares of the others by sending
+    requests with many distinct tokens."""
+    now = time.time()
+    window = app.config['ADMISSION_TENANT_WINDOW']
+    pipeline = app.redis.pipeline()
+    pipeline.zadd(_TENANTS, {tenant: now})
+    pipeline.zadd(_ADDRESSES, {str(address or ""): now})
+    pipeline.zremrangebyscore(_TENANTS, "-inf", now - window)
+    pipeline.zremrangebyscore(_ADDRESSES, "-inf", now - window)
+    pipeline.zcard(_TENANTS)
+    pipeline.zcard(_ADDRESSES)
+    tenants, addresses = pipeline.execute()[4:]
+    tenants = min(tenants, addresses * app.config['ADMISSION_TENANTS_PER_ADDRESS'])
+    rate = workers / max(tenants, 1)
+    capacity = app.config['ADMISSION_TENANT_BURST']
+    # a job that costs more than a full bucket is admitted once the bucket is full
+    cost = min(cost, capacity)
+    key = _KEY_PREFIX + "bucket:" + tenant
+    retry_after = []
+
+    def take(pipe):
+        tokens, updated = pipe.hmget(key, "tokens", "updated")
+        tokens = capacity if tokens is None else float(tokens)
+        if updated is not None:
+            tokens = min(capacity, tokens + max(now - float(updated), 0) * rate)
+        retry_after[:] = [0 if tokens >= cost else (cost - tokens) / rate]
+        pipe.multi()
+        pipe.hset(key, mapping={"tokens": tokens - cost if tokens >= cost else tokens, "updated": now})
+        pipe.expire(key, int(capacity / rate + window))
+
+    app.redis.transaction(take, key)
+    return retry_after[0]
+
+
+def _reconcile():
+    """Release the work of jobs that are no longer queued or running, e.g. because their worker died. Runs at most
+    once per minute and only when a job would be rejected. Returns whether it ran."""
+    if not app.redis.set(_RECONCILED, 1, nx=True, ex=60):
+        return False
+    job_ids = [job_id.decode() for job_id in app.redis.hkeys(_WORK)]
+    jobs = Job.fetch_many(job_ids, connection=app.redis) if job_ids else []
+    for job_id, job in zip(job_ids, jobs):
+        if job is None or job.get_status(refresh=False) not in _OUTSTANDING:
+            finished(job_id)
+    return True
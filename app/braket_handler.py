@@ -16,99 +16,225 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 # ******************************************************************************
-from time import sleep
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import json
+import threading
 
 import boto3
+import numpy as np
 from braket.circuits import Circuit, Noise
-from braket.devices import LocalSimulator
-from braket.aws import AwsDevice
-from braket.tasks import QuantumTask
+from braket.aws import AwsQuantumTask, AwsSession
 from botocore.config import Config
 
+from app import app, cancellation, device_catalog, metrics, noise_models, sampling
+
+# boto3 clients are thread-safe and expensive to create, so they are shared by all jobs of a process
+_clients = {}
+_clients_lock = threading.Lock()
+
 
 def get_backend(qpu, client = None):
     """Get backend."""
     if qpu.lower() == "local-simulator":
-        return LocalSimulator("braket_dm")
+        return sampling.local_simulator("braket_dm")
     elif client:
-        try:
-            return client.get_device(qpu)
-        except ValueError:
-            return None
+        return device_catalog.get(qpu, client)
+
+def set_up_client(access_key, secret_access_key, region, braket_endpoint_url=None, s3_endpoint_url=None):
+    """Return the Braket and S3 clients for the credentials and region, which are created and checked for the result
+    bucket only once per process."""
+    key = (access_key, secret_access_key, region, braket_endpoint_url, s3_endpoint_url)
+    with _clients_lock:
+        clients = _clients.get(key)
+        if clients is None:
+            clients = _create_clients(*key)
+            _clients[key] = clients
+    return clients
+
 
-def set_up_client(access_key, secret_access_key, region):
+def _create_clients(access_key, secret_access_key, region, braket_endpoint_url, s3_endpoint_url):
     custom_config = Config(
         region_name=region,
+        max_pool_connections=app.config['S3_MAX_POOL_CONNECTIONS'],
     )
     braket_client = boto3.client('braket', aws_access_key_id=access_key, aws_secret_access_key=secret_access_key,
-                                config=custom_config)
+                                config=custom_config, endpoint_url=braket_endpoint_url)
     s3_client = boto3.client('s3', aws_access_key_id=access_key, aws_secret_access_key=secret_access_key,
-                            config=custom_config)
+                            config=custom_config, endpoint_url=s3_endpoint_url)
 
-    s3_response = s3_client.s3client.list_buckets
+    s3_response = s3_client.list_buckets()
     bucket_available = False
     for bucket in s3_response["Buckets"]:
         if bucket["Name"] == "braket-service-bucket":
             bucket_available = True
     if not bucket_available:
-        s3_client.create_bucket(Bucket="braket-service-bucket")
+        if region == "us-east-1":
+            s3_client.create_bucket(Bucket="braket-service-bucket")
+        else:
+            s3_client.create_bucket(Bucket="braket-service-bucket",
+                                    CreateBucketConfiguration={"LocationConstraint": region})
     return braket_client, s3_client
 
 
-def execute_job(circuit: Circuit, shots, qpu, clients = None):
-    """Execute and Simulate Job on simulator and return results"""
+def get_clients():
+    """Set up the Braket and S3 clients for the AWS account configured for the service."""
+    return set_up_client(app.config['AWS_ACCESS_KEY_ID'], app.config['AWS_SECRET_ACCESS_KEY'],
+                         app.config['AWS_REGION'], app.config['BRAKET_ENDPOINT_URL'], app.config['S3_ENDPOINT_URL'])
+
+
+def execute_job(circuit: Circuit, shots, qpu, noise_model=noise_models.DEFAULT, seed=None, timeout=None, job_id=None):
+    """Execute and Simulate Job on simulator and return results.
+    Jobs for QPUs are not awaited, they are submitted with submit_remotely and finished by the remote tracker."""
     if qpu.lower() == "local-simulator":
-        return execute_locally(circuit, shots)
-    elif clients:
-        return execute_remotely(circuit, shots, qpu, clients)
+        return execute_locally(circuit, shots, noise_model, seed, timeout, job_id)
     return None
 
 
-def execute_locally(circuit: Circuit, shots):
-    backend = LocalSimulator("braket_dm")
-    noise = Noise.Depolarizing(probability=0.1)
-    circuit.apply_gate_noise(noise)
-    circuit.apply_readout_noise(noise)
-    circuit.apply_initialization_noise(noise)
-    task = backend.run(circuit, shots=shots)
-    status = task.state()
-    while not status == "COMPLETED":
-        if status == "FAILED" or status == "CANCELLED":
-            print("The execution failed or was cancelled.")
-            return None
-        print("The task is still running")
-        status = task.state()
-    result = task.result()
-    return result.measurement_counts
-
-
-def execute_remotely(circuit: Circuit, shots, qpu, clients):
-    client = clients[0]
-    s3_client = clients[1]
-    response = client.search_devices(filters=[{
-        "name": "deviceArn",
-        "values": [qpu]
-    }])
-    if len(response["devices"]) == 0:
-        print("No device found with that arn")
+def execute_batch(circuits, shots, qpu, max_parallel=None, noise_model=noise_models.DEFAULT, timeout=None,
+                  job_id=None):
+    """Execute several circuits on the local simulator with the batch API of the Braket SDK and return their results.
+    The results are in the order of the circuits, failed executions are None. Like execute_locally, the simulation
+    runs in a child process that is killed after timeout seconds, which raises a TimeoutError, or when the
+    cancellation of the job is requested, which raises Canceled. Circuits for QPUs are submitted with submit_batch
+    instead."""
+    if qpu.lower() == "local-simulator":
+        with metrics.stage("noise"):
+            for circuit in circuits:
+                noise_model.apply(circuit)
+        with metrics.stage("simulation"):
+            return sampling.run_in_child(_run_batch, select_simulator(circuits), circuits, shots, max_parallel,
+                                         timeout=timeout, check=_cancel_check(job_id))
+    return [None] * len(circuits)
+
+
+def _run_batch(simulator, circuits, shots, max_parallel):
+    batch = sampling.local_simulator(simulator).run_batch(circuits, shots=shots, max_parallel=max_parallel)
+    return [dict(result.measurement_counts) if result else None for result in batch.results()]
+
+
+def _cancel_check(job_id):
+    """Return the check run_in_child calls to stop the simulation of a canceled job, None without a job."""
+    return functools.partial(cancellation.check, job_id) if job_id else None
+
+
+def select_simulator(circuits):
+    """Return the local simulator for the circuits, the state vector simulator unless one of them contains noise."""
+    if any(_has_noise(circuit) for circuit in circuits):
+        return "braket_dm"
+    return "braket_sv"
+
+
+def check_circuit_memory(circuit: Circuit, noise_model):
+    """Raise a ValueError if the local simulation of the circuit with the noise model needs too much memory."""
+    # the simulators allocate all qubits up to the highest index
+    qubit_count = max(circuit.qubits) + 1 if circuit.qubits else 0
+    sampling.check_memory(int(qubit_count), needs_density_matrix(circuit, noise_model))
+
+
+def needs_density_matrix(circuit: Circuit, noise_model):
+    """Return whether the circuit with the noise model must be simulated with the density matrix simulator."""
+    return not noise_model.is_noiseless or _has_noise(circuit)
+
+
+def _has_noise(circuit: Circuit):
+    return any(isinstance(instruction.operator, Noise) for instruction in circuit.instructions)
+
+
+def execute_locally(circuit: Circuit, shots, noise_model=noise_models.DEFAULT, seed=None, timeout=None, job_id=None):
+    """Simulate the circuit with the noise model and return its measurement counts, None if it fails or takes longer
+    than timeout seconds. The simulation runs in a child process that is killed after the timeout or when the
+    cancellation of the job is requested, which raises Canceled. The caller waits on the child instead of polling the
+    simulator's state, so the simulator gets the CPU."""
+    with metrics.stage("noise"):
+        noise_model.apply(circuit)
+    run = functools.partial(sampling.run_in_child, timeout=timeout, check=_cancel_check(job_id))
+    try:
+        with metrics.stage("simulation"):
+            return sampling.measurement_counts(select_simulator([circuit]), circuit, shots, seed, run=run)
+    except cancellation.Canceled:
+        raise
+    except TimeoutError:
+        app.logger.error(f"The simulation did not finish within {timeout} seconds.")
+        return None
+    except Exception as e:
+        app.logger.error("The simulation failed: " + str(e))
         return None
-    kwargs = {
-        "action": {circuit.to_ir()},
-        "device": {qpu},
-        "deviceParameters": '{"braketSchemaHeader": {"name": "braket.device_schema.simulators.gate_model_simulator_device_parameters", "version": "1"}, "paradigmParameters": {"braketSchemaHeader": {"name": "braket.device_schema.gate_model_parameters", "version": "1"}, "qubitCount":' + str(
-            len(circuit.qubits)) + '}"',
-        "outputS3Bucket": "braket-service-bucket",
-        "outputS3KeyPrefix": "braket-service",
-        "shots": shots
-    }
-    response = client.create_quantum_task(**kwargs)
-    task_arn = response["quantumTaskArn"]
-    response = client.get_quantum_task(quantumTaskArn=task_arn)
-    while response["status"] != "FINISHED":
-        if response["status"] == "FAILED" or response["status"] == "CANCELLED":
+
+
+def submit_remotely(circuit: Circuit, shots, qpu, clients):
+    """Create a quantum task for the circuit on the QPU and return its ARN without waiting for the task."""
+    with metrics.stage("submission"):
+        return _create_task(AwsSession(braket_client=clients[0]), circuit, shots, qpu)
+
+
+def submit_batch(circuits, shots, qpu, clients):
+    """Create a quantum task for every circuit on the QPU without waiting for the tasks and return their ARNs in the
+    order of the circuits, None for the circuits whose submission failed. Unlike AwsQuantumTaskBatch, which blocks
+    until the tasks finish, the tasks are left to the remote tracker like those of single executions."""
+    session = AwsSession(braket_client=clients[0])
+
+    def submit(circuit):
+        try:
+            return _create_task(session, circuit, shots, qpu)
+        except Exception:
+            app.logger.exception(f"Submitting a quantum task to {qpu} failed")
             return None
-        sleep(3)
-        response = client.get_quantum_task(quantumTaskArn=task_arn)
-    print("execution finished")
-    with open('results.txt', 'wb') as f:
-        s3_client.download_fileobj("braket-service-bucket", "braket-service", f)
+
+    # the stage is measured in the calling thread, which holds the timings of the job
+    with metrics.stage("submission"):
+        with ThreadPoolExecutor(max_workers=app.config['BATCH_MAX_PARALLEL']) as executor:
+            return list(executor.map(submit, circuits))
+
+
+def _create_task(session, circuit, shots, qpu):
+    task = AwsQuantumTask.create(session, qpu, circuit, ("braket-service-bucket", "braket-service"), shots,
+                                 quiet=True)
+    return task.id
+
+
+def get_remote_result(s3_client, bucket, directory):
+    """Read the result of a completed quantum task from S3 into memory and return its measurement counts."""
+    return parse_measurement_counts(_read_object(s3_client, bucket, directory + "/results.json"))
+
+
+def parse_measurement_counts(data):
+    """Return the measurement counts of a serialized gate model task result."""
+    result = json.loads(data)
+    if result.get("measurementCounts"):
+        return result["measurementCounts"]
+    if result.get("measurements"):
+        # every shot is turned into its bit string in one step and the distinct bit strings are counted
+        measurements = np.asarray(result["measurements"], dtype=np.uint8) + ord("0")
+        bit_strings = np.ascontiguousarray(measurements).view(f"S{measurements.shape[1]}").ravel()
+        values, counts = np.unique(bit_strings, return_counts=True)
+        return {value.decode("ascii"): int(count) for value, count in zip(values, counts)}
+    if result.get("measurementProbabilities"):
+        shots = result["taskMetadata"]["shots"]
+        return {state: int(round(probability * shots))
+                for state, probability in result["measurementProbabilities"].items()}
+    return {}
+
+
+def _read_object(s3_client, bucket, key):
+    """Read an S3 object into memory. The first part tells the size of the object, the remaining parts of large
+    objects are read with parallel ranged requests."""
+    part_size = app.config['S3_RANGE_SIZE']
+    response = s3_client.get_object(Bucket=bucket, Key=key, Range=f"bytes=0-{part_size - 1}")
+    first_part = response["Body"].read()
+    content_range = response.get("ContentRange")
+    size = int(content_range.rsplit("/", 1)[1]) if content_range else len(first_part)
+    if size <= len(first_part):
+        return first_part
+
+    data = bytearray(size)
+    data[:len(first_part)] = first_part
+
+    def read_part(start):
+        end = min(start + part_size, size) - 1
+        body = s3_client.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-{end}")["Body"].read()
+        data[start:start + len(body)] = body
+
+    with ThreadPoolExecutor(max_workers=app.config['S3_RANGE_PARALLEL']) as executor:
+        list(executor.map(read_part, range(len(first_part), size, part_size)))
+    return bytes(data)
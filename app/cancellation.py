@@ -0,0 +1,138 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+import logging
+import uuid
+
+from rq.exceptions import NoSuchJobError
+from rq.job import Job, JobStatus
+
+from app import admission, app, db, job_queues, result_memo, result_notifications
+
+_KEY_PREFIX = "braket-service:cancel:"
+
+# jobs in these states have not started yet and are removed from their queue
+_WAITING = (JobStatus.QUEUED, JobStatus.DEFERRED, JobStatus.SCHEDULED)
+
+
+class Canceled(Exception):
+    """Raised in a job whose cancellation was requested while it was running."""
+
+
+def cancel(result):
+    """Cancel the execution of an unfinished result and finalize the result, and the unfinished results of its batch,
+    with the state the execution was in. A queued job is removed from its queue, a running job is stopped by its
+    worker, and the quantum tasks of executions on QPUs are canceled. A memoized result only stops sharing the
+    execution of another request, and the execution of a result that identical requests share is handed over to
+    them."""
+    state = "queued"
+    job = None
+    if result.alias_of:
+        # a memoized result shares the execution of another request, which continues for that request
+        state = "shared"
+    else:
+        # the flag is set first, so that a worker that dequeues the job meanwhile does not execute it
+        app.redis.set(_KEY_PREFIX + result.id, 1,
+                      ex=max(app.config[tier.upper() + '_QUEUE_TIMEOUT'] for tier in job_queues.TIERS))
+        try:
+            job = Job.fetch(result.id, connection=app.redis)
+        except NoSuchJobError:
+            pass
+    if job is not None:
+        cost = admission.cost_of(job.id)
+        status = job.get_status()
+        if status in _WAITING:
+            job.cancel()
+            admission.finished(job.id)
+        elif status != JobStatus.FINISHED:
+            state = "running"
+        memo_key = job.kwargs.get('memo_key')
+        if memo_key and status != JobStatus.FINISHED and not _hand_over(result, job, cost):
+            result_memo.forget(memo_key)
+
+    from app.result_model import Result
+    children = Result.query.filter_by(parent_id=result.id).all()
+    # a batch is complete once its quantum tasks are submitted, so its result only lists theirs
+    submitted_batch = result.complete and any(not child.complete for child in children)
+    if submitted_batch or any(child.task_arn for child in children):
+        # the job of the batch or sweep submitted quantum tasks that did not finish yet
+        state = "submitted"
+    # only results that the job did not finish meanwhile are finalized, and a job that finishes them later leaves
+    # them unchanged, see Result.update_unfinished
+    finalized = [child.id for child in children if Result.finalize(child.id, {'error': 'canceled', 'state': state})]
+    canceled = {'error': 'canceled', 'state': state}
+    if children:
+        canceled['results'] = {child.id: '/braket-service/api/v1.0/results/' + child.id for child in children}
+    if submitted_batch:
+        Result.query.filter_by(id=result.id).update(Result.encoded(canceled), synchronize_session=False)
+        finalized.append(result.id)
+    elif Result.finalize(result.id, canceled, alias_of=None):
+        finalized.append(result.id)
+    db.session.commit()
+
+    # the tasks are looked up after the results were finalized, which includes the tasks of jobs that recorded them
+    # right before, while jobs that record them later cancel them themselves
+    for submitted in Result.query.filter(Result.id.in_(finalized), Result.task_arn.isnot(None)).all():
+        submitted.result = dict(submitted.result, **{'state': "submitted",
+                                                     'task-state': cancel_task(submitted.task_arn)})
+    db.session.commit()
+    for result_id in finalized:
+        result_notifications.publish(result_id)
+
+
+def cancel_task(task_arn):
+    """Cancel the quantum task and return its cancellation status, or its error if it cannot be canceled anymore."""
+    from app import braket_handler
+    try:
+        response = braket_handler.get_clients()[0].cancel_quantum_task(quantumTaskArn=task_arn,
+                                                                       clientToken=str(uuid.uuid4()))
+        return response['cancellationStatus']
+    except Exception as e:
+        logging.warning(f"Canceling the quantum task {task_arn} failed: {e}")
+        return str(e)
+
+
+def requested(job_id):
+    """Return whether the cancellation of the job was requested."""
+    return bool(job_id) and bool(app.redis.exists(_KEY_PREFIX + job_id))
+
+
+def check(job_id):
+    """Raise Canceled if the cancellation of the job was requested."""
+    if requested(job_id):
+        raise Canceled()
+
+
+def _hand_over(result, job, cost):
+    """Queue the canceled job of a memoized request again under the id of one of the identical requests that share
+    its execution, whose result holds the payload from then on. Returns whether any request shares the execution."""
+    from app.result_model import Result
+    heir = Result.query.filter_by(alias_of=result.id, complete=False).first()
+    if heir is None:
+        return False
+    # identical requests that arrive from now on share the execution of the heir
+    result_memo.replace(job.kwargs['memo_key'], result.id, heir.id)
+    Result.query.filter_by(alias_of=result.id).update({'alias_of': heir.id}, synchronize_session=False)
+    Result.query.filter_by(id=heir.id).update({'alias_of': None, 'estimate': result.estimate},
+                                              synchronize_session=False)
+    db.session.commit()
+    queue = next(queue for queue in app.execute_queues.values() if queue.name == job.origin)
+    admission.track(heir.id, cost)
+    queue.enqueue(job.func_name, job_id=heir.id, job_timeout=job.timeout, **job.kwargs)
+    logging.info(f"The execution of the canceled result {result.id} is handed over to {heir.id}")
+    return True
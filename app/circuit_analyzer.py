@@ -0,0 +1,163 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+import hashlib
+import json
+
+from app import app, circuit_cache
+from app.lru_cache import LRUCache
+
+# instruction types of the Braket-IR that are noise channels instead of gates
+NOISE_TYPES = frozenset([
+    "bit_flip", "phase_flip", "pauli_channel", "multi_qubit_pauli_channel", "depolarizing",
+    "two_qubit_depolarizing", "two_qubit_dephasing", "amplitude_damping", "generalized_amplitude_damping",
+    "phase_damping", "kraus",
+])
+
+_metrics = LRUCache(app.config["METRICS_CACHE_SIZE"])
+
+
+class CircuitMetrics:
+    def __init__(self, depth, multi_qubit_gate_depth, width, gate_counts_by_arity, gate_counts_by_type,
+                 number_of_measurement_operations, number_of_noise_operations=0, qubit_count=None):
+        self.depth = depth
+        self.multi_qubit_gate_depth = multi_qubit_gate_depth
+        self.width = width
+        self.gate_counts_by_arity = gate_counts_by_arity
+        self.gate_counts_by_type = gate_counts_by_type
+        self.number_of_measurement_operations = number_of_measurement_operations
+        self.number_of_noise_operations = number_of_noise_operations
+        # the simulators and devices allocate all qubits up to the highest index, which may exceed the width
+        self.qubit_count = width if qubit_count is None else qubit_count
+
+    @property
+    def total_number_of_gates(self):
+        return sum(self.gate_counts_by_arity.values())
+
+    @property
+    def number_of_single_qubit_gates(self):
+        return self.gate_counts_by_arity.get(1, 0)
+
+    @property
+    def number_of_multi_qubit_gates(self):
+        return self.total_number_of_gates - self.number_of_single_qubit_gates
+
+    @property
+    def total_number_of_operations(self):
+        return self.total_number_of_gates + self.number_of_measurement_operations
+
+
+def analyze_braket_ir(braket_ir: str) -> CircuitMetrics:
+    """Compute the metrics of a Braket-IR string without building a circuit. Results are memoized by IR hash.
+    Raise a ValueError if the IR is malformed or contains unknown instruction types."""
+    # resubmissions are usually byte-identical, so hashing the raw text avoids decoding large IRs on a hit
+    key = hashlib.sha256(braket_ir.encode("utf-8")).hexdigest()
+    metrics = _metrics.get(key)
+    if metrics is None:
+        # the schema only validates the IR, the metrics are computed from the plain JSON
+        from braket.ir.jaqcd import Program
+        Program.parse_raw(braket_ir)
+        metrics = _analyze(json.loads(braket_ir))
+        _metrics.put(key, metrics)
+    return metrics
+
+
+def analyze_circuit(circuit) -> CircuitMetrics:
+    """Compute the metrics of a braket circuit via its IR."""
+    from braket.circuits.serialization import IRType
+    return analyze_ir(json.loads(circuit.to_ir(ir_type=IRType.JAQCD).json()))
+
+
+def analyze_ir(ir: dict) -> CircuitMetrics:
+    key = circuit_cache.ir_dict_hash(ir)
+    metrics = _metrics.get(key)
+    if metrics is None:
+        metrics = _analyze(ir)
+        _metrics.put(key, metrics)
+    return metrics
+
+
+def _analyze(ir):
+    """Compute all metrics in a single pass over the instructions. For every qubit, the layer of its latest gate
+    and of its latest multi-qubit gate are tracked; a gate is placed one layer after the latest of its qubits."""
+    if not isinstance(ir, dict) or not isinstance(ir.get("instructions"), list):
+        raise ValueError("Braket-IR must contain a list of instructions.")
+
+    layers = {}
+    multi_qubit_layers = {}
+    depth = 0
+    multi_qubit_gate_depth = 0
+    gate_counts_by_type = {}
+    gate_counts_by_arity = {}
+    other_qubits = set()
+    number_of_noise_operations = 0
+
+    for instruction in ir["instructions"]:
+        instruction_type = instruction["type"]
+        if instruction_type in NOISE_TYPES:
+            # like braket's Moments, noise does not contribute to the depth
+            other_qubits.update(_qubits_of(instruction))
+            number_of_noise_operations += 1
+            continue
+        instruction_qubits = _qubits_of(instruction)
+        arity = len(instruction_qubits)
+        if arity == 1:
+            qubit = instruction_qubits[0]
+            layer = layers.get(qubit, 0) + 1
+            layers[qubit] = layer
+        elif arity:
+            layer = max([layers.get(qubit, 0) for qubit in instruction_qubits]) + 1
+            multi_qubit_layer = max([multi_qubit_layers.get(qubit, 0) for qubit in instruction_qubits]) + 1
+            for qubit in instruction_qubits:
+                layers[qubit] = layer
+                multi_qubit_layers[qubit] = multi_qubit_layer
+            if multi_qubit_layer > multi_qubit_gate_depth:
+                multi_qubit_gate_depth = multi_qubit_layer
+        else:
+            # compiler directives such as verbatim boxes
+            continue
+        if layer > depth:
+            depth = layer
+        gate_counts_by_type[instruction_type] = gate_counts_by_type.get(instruction_type, 0) + 1
+        gate_counts_by_arity[arity] = gate_counts_by_arity.get(arity, 0) + 1
+
+    results = ir.get("results") or []
+    for result in results:
+        # like braket's Circuit.qubits, only observables add qubits to the width
+        if "observable" in result:
+            other_qubits.update(result.get("targets") or [])
+    qubits = other_qubits.union(layers)
+    width = len(qubits)
+
+    return CircuitMetrics(depth, multi_qubit_gate_depth, width, gate_counts_by_arity, gate_counts_by_type,
+                          len(results), number_of_noise_operations, int(max(qubits)) + 1 if qubits else 0)
+
+
+def _qubits_of(instruction):
+    if "target" in instruction:
+        if "control" in instruction:
+            return [instruction["control"], instruction["target"]]
+        if "controls" in instruction:
+            return instruction["controls"] + [instruction["target"]]
+        return [instruction["target"]]
+    qubits = instruction.get("targets") or []
+    if "control" in instruction:
+        return [instruction["control"]] + qubits
+    if "controls" in instruction:
+        return instruction["controls"] + qubits
+    return qubits
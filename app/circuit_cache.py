@@ -0,0 +1,65 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+import hashlib
+import json
+import pickle
+
+from app import app
+from app.lru_cache import LRUCache
+
+_REDIS_KEY_PREFIX = "braket-service:circuit:"
+
+_circuits = LRUCache(app.config["CIRCUIT_CACHE_SIZE"], app.config["CIRCUIT_CACHE_MAX_BYTES"])
+
+
+def ir_hash(braket_ir: str) -> str:
+    """Return the content hash of a Braket-IR string, independent of its formatting and key order."""
+    return ir_dict_hash(json.loads(braket_ir))
+
+
+def ir_dict_hash(ir: dict) -> str:
+    normalized = json.dumps(ir, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def get(key):
+    """Return a private copy of the cached circuit, or None if neither cache tier holds it."""
+    data = _circuits.get(key)
+    if data is None and app.config["CIRCUIT_CACHE_REDIS"]:
+        try:
+            data = app.redis.get(_REDIS_KEY_PREFIX + key)
+        except Exception as e:
+            app.logger.warning("Could not read circuit cache from redis: " + str(e))
+        if data is not None:
+            _circuits.put(key, data)
+    if data is None:
+        return None
+    # every hit is unpickled separately, so callers may apply noise or bind parameters without side effects
+    return pickle.loads(data)
+
+
+def put(key, circuit):
+    """Store a prepared circuit in the in-process cache and, if enabled, in redis."""
+    data = pickle.dumps(circuit, protocol=pickle.HIGHEST_PROTOCOL)
+    _circuits.put(key, data)
+    if app.config["CIRCUIT_CACHE_REDIS"]:
+        try:
+            app.redis.set(_REDIS_KEY_PREFIX + key, data, ex=app.config["CIRCUIT_CACHE_TTL"])
+        except Exception as e:
+            app.logger.warning("Could not write circuit cache to redis: " + str(e))
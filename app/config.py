@@ -28,6 +28,111 @@ class Config(object):
 
     REDIS_URL = os.environ.get('REDIS_URL') or 'redis://localhost:5040'
 
+    # import the Braket SDK when the app is loaded, so gunicorn --preload workers share it copy-on-write
+    GUNICORN_PRELOAD = (os.environ.get('GUNICORN_PRELOAD') or 'false').lower() == 'true'
+
+    # cache of prepared circuits for Braket-IR inputs, shared between web and worker processes via redis if enabled
+    CIRCUIT_CACHE_SIZE = int(os.environ.get('CIRCUIT_CACHE_SIZE') or 256)
+    CIRCUIT_CACHE_MAX_BYTES = int(os.environ.get('CIRCUIT_CACHE_MAX_BYTES') or 64 * 1024 * 1024)
+    CIRCUIT_CACHE_REDIS = (os.environ.get('CIRCUIT_CACHE_REDIS') or 'false').lower() == 'true'
+    CIRCUIT_CACHE_TTL = int(os.environ.get('CIRCUIT_CACHE_TTL') or 24 * 3600)
+
+    # cache of downloaded implementations, kept in memory and on disk and revalidated with conditional requests
+    DOWNLOAD_CACHE_DIR = os.environ.get('DOWNLOAD_CACHE_DIR', os.path.join(basedir, 'download-cache'))
+    DOWNLOAD_CACHE_SIZE = int(os.environ.get('DOWNLOAD_CACHE_SIZE') or 128)
+    DOWNLOAD_CACHE_MAX_BYTES = int(os.environ.get('DOWNLOAD_CACHE_MAX_BYTES') or 32 * 1024 * 1024)
+    DOWNLOAD_CACHE_DISK_MAX_BYTES = int(os.environ.get('DOWNLOAD_CACHE_DISK_MAX_BYTES') or 512 * 1024 * 1024)
+    DOWNLOAD_POOL_SIZE = int(os.environ.get('DOWNLOAD_POOL_SIZE') or 10)
+
+    # number of compiled Python implementations kept per process
+    IMPLEMENTATION_CACHE_SIZE = int(os.environ.get('IMPLEMENTATION_CACHE_SIZE') or 128)
+
+    # decoded unitary and Kraus matrices of Braket-IR instructions
+    MATRIX_CACHE_SIZE = int(os.environ.get('MATRIX_CACHE_SIZE') or 256)
+    MATRIX_CACHE_MAX_BYTES = int(os.environ.get('MATRIX_CACHE_MAX_BYTES') or 64 * 1024 * 1024)
+
+    # memoized /transpile metrics
+    METRICS_CACHE_SIZE = int(os.environ.get('METRICS_CACHE_SIZE') or 1024)
+
+    # number of circuits of a batch execution that are simulated or submitted in parallel
+    BATCH_MAX_PARALLEL = int(os.environ.get('BATCH_MAX_PARALLEL') or os.cpu_count() or 1)
+
+    # execution jobs are routed by their estimated runtime and memory to the queue of a tier, see cost_model, and
+    # every queue has its own job timeout in seconds
+    SMALL_JOB_MAX_SECONDS = float(os.environ.get('SMALL_JOB_MAX_SECONDS') or 10)
+    MEDIUM_JOB_MAX_SECONDS = float(os.environ.get('MEDIUM_JOB_MAX_SECONDS') or 600)
+    MEDIUM_JOB_MAX_MEMORY = int(os.environ.get('MEDIUM_JOB_MAX_MEMORY') or 1024 * 1024 * 1024)
+    SMALL_QUEUE_TIMEOUT = int(os.environ.get('SMALL_QUEUE_TIMEOUT') or 300)
+    MEDIUM_QUEUE_TIMEOUT = int(os.environ.get('MEDIUM_QUEUE_TIMEOUT') or 3600)
+    LARGE_QUEUE_TIMEOUT = int(os.environ.get('LARGE_QUEUE_TIMEOUT') or 6 * 3600)
+    REMOTE_QUEUE_TIMEOUT = int(os.environ.get('REMOTE_QUEUE_TIMEOUT') or 3600)
+    # seconds after which the calibrated coefficients of the cost model are reloaded from redis
+    COST_MODEL_REFRESH = float(os.environ.get('COST_MODEL_REFRESH') or 60)
+
+    # execution requests are rejected with 429 while ADMISSION_MAX_QUEUE_DEPTH jobs are queued or the estimated work of
+    # the admitted jobs keeps the workers busy for longer than ADMISSION_MAX_WORK_PER_WORKER seconds, every job costs
+    # at least ADMISSION_MIN_COST seconds; tenants share the workers equally and may use up to ADMISSION_TENANT_BURST
+    # seconds of work at once, tenants without requests in the last ADMISSION_TENANT_WINDOW seconds get no share, and
+    # the tenants that share the workers are at most ADMISSION_TENANTS_PER_ADDRESS times the addresses they use
+    ADMISSION_CONTROL = (os.environ.get('ADMISSION_CONTROL') or 'true').lower() == 'true'
+    ADMISSION_MAX_QUEUE_DEPTH = int(os.environ.get('ADMISSION_MAX_QUEUE_DEPTH') or 1000)
+    ADMISSION_MAX_WORK_PER_WORKER = float(os.environ.get('ADMISSION_MAX_WORK_PER_WORKER') or 4 * 3600)
+    ADMISSION_MIN_COST = float(os.environ.get('ADMISSION_MIN_COST') or 1)
+    ADMISSION_TENANT_BURST = float(os.environ.get('ADMISSION_TENANT_BURST') or 3600)
+    ADMISSION_TENANT_WINDOW = float(os.environ.get('ADMISSION_TENANT_WINDOW') or 300)
+    ADMISSION_TENANTS_PER_ADDRESS = int(os.environ.get('ADMISSION_TENANTS_PER_ADDRESS') or 4)
+
+    # seconds a local simulation may run before its execution fails, by default 90% of the timeout of its queue
+    LOCAL_SIMULATION_TIMEOUT = int(os.environ.get('LOCAL_SIMULATION_TIMEOUT') or 0)
+    # seconds between the checks of a running local simulation for the cancellation of its job
+    CANCEL_POLL_INTERVAL = float(os.environ.get('CANCEL_POLL_INTERVAL') or 0.5)
+    # circuits that measure all qubits are sampled from their cached distribution, other circuits with at least
+    # twice SHARD_MIN_SHOTS shots are split into shards that run in up to SIMULATION_PROCESSES processes
+    DISTRIBUTION_CACHE_SIZE = int(os.environ.get('DISTRIBUTION_CACHE_SIZE') or 64)
+    DISTRIBUTION_CACHE_MAX_BYTES = int(os.environ.get('DISTRIBUTION_CACHE_MAX_BYTES') or 256 * 1024 * 1024)
+    SHARD_MIN_SHOTS = int(os.environ.get('SHARD_MIN_SHOTS') or 100000)
+    SIMULATION_PROCESSES = int(os.environ.get('SIMULATION_PROCESSES') or os.cpu_count() or 1)
+    # local simulations that need more memory for the state vector or density matrix are rejected
+    LOCAL_SIMULATION_MAX_MEMORY = int(os.environ.get('LOCAL_SIMULATION_MAX_MEMORY') or 4 * 1024 * 1024 * 1024)
+
+    # AWS account for QPU executions, the endpoint urls allow to run against local stubs of the Braket and S3 APIs
+    AWS_ACCESS_KEY_ID = os.environ.get('AWS_ACCESS_KEY_ID')
+    AWS_SECRET_ACCESS_KEY = os.environ.get('AWS_SECRET_ACCESS_KEY')
+    AWS_REGION = os.environ.get('AWS_REGION') or 'us-east-1'
+    BRAKET_ENDPOINT_URL = os.environ.get('BRAKET_ENDPOINT_URL')
+    S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL')
+
+    # connections kept per AWS client and ranged parallel reads of large task results from S3
+    S3_MAX_POOL_CONNECTIONS = int(os.environ.get('S3_MAX_POOL_CONNECTIONS') or 32)
+    S3_RANGE_SIZE = int(os.environ.get('S3_RANGE_SIZE') or 8 * 1024 * 1024)
+    S3_RANGE_PARALLEL = int(os.environ.get('S3_RANGE_PARALLEL') or 4)
+
+    # seconds after which the cached catalog of the remote devices is refreshed in the background
+    DEVICE_CATALOG_TTL = int(os.environ.get('DEVICE_CATALOG_TTL') or 300)
+    # seconds during which a failed first fetch of the catalog is reported again without calling the Braket API
+    DEVICE_CATALOG_RETRY = int(os.environ.get('DEVICE_CATALOG_RETRY') or 30)
+
+    # polling of outstanding quantum tasks by the remote tracker, the interval grows while no task finishes
+    TRACKER_MIN_INTERVAL = float(os.environ.get('TRACKER_MIN_INTERVAL') or 2)
+    TRACKER_MAX_INTERVAL = float(os.environ.get('TRACKER_MAX_INTERVAL') or 60)
+    TRACKER_MAX_CONCURRENCY = int(os.environ.get('TRACKER_MAX_CONCURRENCY') or 16)
+    # seconds of task creations covered by the search, older outstanding tasks are looked up one by one
+    TRACKER_SEARCH_WINDOW = int(os.environ.get('TRACKER_SEARCH_WINDOW') or 3600)
+
+    # longest wait of a long-poll for a result and interval of the keep-alive comments of result streams in seconds
+    RESULT_MAX_WAIT = float(os.environ.get('RESULT_MAX_WAIT') or 60)
+    RESULT_STREAM_HEARTBEAT = float(os.environ.get('RESULT_STREAM_HEARTBEAT') or 15)
+
+    # memoized executions of requests with "memo": true, kept for MEMO_TTL seconds and evicted oldest first
+    MEMO_TTL = int(os.environ.get('MEMO_TTL') or 24 * 3600)
+    MEMO_MAX_ENTRIES = int(os.environ.get('MEMO_MAX_ENTRIES') or 10000)
+
+    # requests with "profile": true are profiled if they send this token in the X-Admin-Token header, which also
+    # grants access to the stored profiles, profiling is disabled without a token
+    PROFILE_ADMIN_TOKEN = os.environ.get('PROFILE_ADMIN_TOKEN')
+    # functions and allocation sites listed in the text report of a profile
+    PROFILE_REPORT_LINES = int(os.environ.get('PROFILE_REPORT_LINES') or 40)
+
     API_TITLE = "Braket Service API"
     API_VERSION = "0.1"
     OPENAPI_VERSION = "3.0.2"
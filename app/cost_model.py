@@ -0,0 +1,202 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+import json
+import threading
+import time
+
+import click
+
+from app import app, sampling
+
+# engines of the local simulations, the state vector and the density matrix simulator
+ENGINES = ("sv", "dm")
+# seconds per circuit, per gate and amplitude of the simulated state, and per shot of every engine, until they are
+# replaced by the coefficients fitted with "flask calibrate-cost-model"
+DEFAULT_COEFFICIENTS = {
+    "sv": [0.05, 1e-8, 2e-6],
+    "dm": [0.1, 2e-8, 2e-6],
+}
+# stages of the recorded timings that are not part of the runtime of a job
+_NOT_RUNTIME = ("enqueued-at", "queue-wait")
+
+_KEY = "braket-service:cost-model"
+
+_coefficients = None
+_loaded_at = 0
+_lock = threading.Lock()
+
+
+class Estimate:
+    """Predicted runtime and peak memory of an execution job. work holds the features of the local simulations per
+    engine: the number of circuits, the sum of their gate counts times the amplitudes of their states, and the sum of
+    their shots. The runtime is linear in these features."""
+
+    def __init__(self):
+        self.work = {}
+        self.memory = 0
+        self.remote = False
+        self.partial = False
+
+    def add(self, engine, qubit_count, gate_count, shots, circuits=1):
+        """Add circuits of that size that are simulated with the engine."""
+        amplitudes = 4 ** qubit_count if engine == "dm" else 2 ** qubit_count
+        features = self.work.setdefault(engine, [0, 0, 0])
+        features[0] += circuits
+        features[1] += circuits * gate_count * amplitudes
+        features[2] += circuits * shots
+        self.memory = max(self.memory, sampling.required_memory(qubit_count, engine == "dm"))
+
+    def add_remote(self):
+        """Add circuits that are executed on a QPU, whose runtime is not spent by the job."""
+        self.remote = True
+
+    def add_unknown(self):
+        """Add a local simulation whose size is not known before its circuit is prepared."""
+        self.partial = True
+
+    @property
+    def seconds(self):
+        return predict(current_coefficients(), self.work)
+
+    @property
+    def tier(self):
+        """Return the tier of the queue of the job. Local simulations of unknown size are at least medium, jobs for
+        QPUs are remote unless they also contain local simulations that are not small."""
+        seconds = self.seconds
+        if seconds > app.config['MEDIUM_JOB_MAX_SECONDS'] or self.memory > app.config['MEDIUM_JOB_MAX_MEMORY']:
+            tier = "large"
+        elif seconds > app.config['SMALL_JOB_MAX_SECONDS'] or self.partial:
+            tier = "medium"
+        else:
+            tier = "small"
+        if self.remote and tier == "small":
+            return "remote"
+        return tier
+
+    def to_json(self):
+        json_response = {'tier': self.tier, 'seconds': round(self.seconds, 3), 'memory-bytes': self.memory,
+                         'work': self.work}
+        if self.partial:
+            json_response['partial'] = True
+        return json_response
+
+
+def predict(coefficients, work):
+    """Return the runtime in seconds of the work of a job with the coefficients."""
+    return sum(coefficient * feature for engine, features in work.items()
+               for coefficient, feature in zip(coefficients[engine], features))
+
+
+def current_coefficients():
+    """Return the calibrated coefficients, which are reloaded from redis every COST_MODEL_REFRESH seconds."""
+    global _coefficients, _loaded_at
+    with _lock:
+        if _coefficients is None or time.monotonic() - _loaded_at > app.config['COST_MODEL_REFRESH']:
+            _coefficients = _load()
+            _loaded_at = time.monotonic()
+        return _coefficients
+
+
+def _load():
+    coefficients = {engine: list(values) for engine, values in DEFAULT_COEFFICIENTS.items()}
+    try:
+        stored = app.redis.get(_KEY)
+    except Exception as e:
+        app.logger.warning(f"Could not load the coefficients of the cost model: {e}")
+        return coefficients
+    if stored:
+        coefficients.update(json.loads(stored))
+    return coefficients
+
+
+def recorded_samples():
+    """Return the work and the runtime of all finished jobs of local simulations that recorded both."""
+    from app.result_model import Result
+
+    samples = []
+    query = Result.query.filter(Result.estimate.isnot(None), Result.timings.isnot(None), Result.alias_of.is_(None))
+    for estimate, timings in query.with_entities(Result.estimate, Result.timings):
+        work = json.loads(estimate).get('work')
+        timings = json.loads(timings)
+        # memoized executions and failed preparations never reach the simulation
+        if work and 'simulation' in timings:
+            samples.append((work, sum(seconds for stage, seconds in timings.items() if stage not in _NOT_RUNTIME)))
+    return samples
+
+
+def fit(samples):
+    """Fit the coefficients to the samples with a non-negative least squares fit of the relative errors, so that
+    short jobs count as much as long ones. Coefficients without samples keep their current value."""
+    import numpy as np
+
+    columns = [(engine, index) for engine in ENGINES for index in range(3)]
+    features = np.array([[work.get(engine, [0, 0, 0])[index] for engine, index in columns] for work, _ in samples],
+                        dtype=float)
+    runtimes = np.array([runtime for _, runtime in samples], dtype=float)
+    weights = 1 / np.maximum(runtimes, 1e-3)
+    scales = np.abs(features).max(axis=0)
+
+    coefficients = current_coefficients()
+    coefficients = {engine: list(coefficients[engine]) for engine in ENGINES}
+    active = [column for column in range(len(columns)) if scales[column] > 0]
+    for column in active:
+        coefficients[columns[column][0]][columns[column][1]] = 0.0
+    while active:
+        # columns with negative coefficients are dropped until all coefficients are non-negative
+        scaled = features[:, active] / scales[active] * weights[:, None]
+        solution = np.linalg.lstsq(scaled, runtimes * weights, rcond=None)[0] / scales[active]
+        if (solution >= 0).all():
+            for column, coefficient in zip(active, solution):
+                coefficients[columns[column][0]][columns[column][1]] = float(coefficient)
+            break
+        active = [column for column, coefficient in zip(active, solution) if coefficient > 0]
+    return coefficients
+
+
+def save(coefficients):
+    """Store the coefficients for all processes, which load them with their next refresh."""
+    global _coefficients
+    app.redis.set(_KEY, json.dumps(coefficients))
+    with _lock:
+        _coefficients = None
+
+
+@app.cli.command("calibrate-cost-model")
+@click.option("--min-samples", default=20, show_default=True, help="Fewest finished jobs to fit the model to.")
+@click.option("--dry-run", is_flag=True, help="Print the fitted coefficients without storing them.")
+def calibrate(min_samples, dry_run):
+    """Fit the cost model to the recorded timings of the finished execution jobs."""
+    samples = recorded_samples()
+    if len(samples) < min_samples:
+        raise click.ClickException(f"Only {len(samples)} jobs recorded their timings, {min_samples} are needed.")
+    before = current_coefficients()
+    after = fit(samples)
+    for engine in ENGINES:
+        click.echo(f"{engine}: {_format(before[engine])} -> {_format(after[engine])}")
+    for name, coefficients in (("before", before), ("after", after)):
+        errors = sorted(abs(predict(coefficients, work) - runtime) / max(runtime, 1e-3) for work, runtime in samples)
+        click.echo(f"median relative error of {len(samples)} jobs {name} the fit: {errors[len(errors) // 2]:.1%}")
+    if not dry_run:
+        save(after)
+        click.echo("The coefficients are stored and used by all processes within "
+                   f"{app.config['COST_MODEL_REFRESH']:.0f} seconds.")
+
+
+def _format(coefficients):
+    return ", ".join(f"{coefficient:.3g}" for coefficient in coefficients)
@@ -0,0 +1,160 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import app
+
+# devices that accept no quantum tasks
+UNAVAILABLE_STATUSES = ("OFFLINE", "RETIRED")
+
+_lock = threading.Lock()
+_catalogs = {}
+# the time and error of the last failed first fetch of a client's catalog
+_failures = {}
+
+
+class CatalogError(Exception):
+    """Raised if the catalog cannot be fetched, unlike the ValueErrors of devices that cannot run a circuit."""
+
+
+class _Catalog:
+    def __init__(self, devices):
+        self.devices = devices
+        self.fetched_at = time.monotonic()
+        self.refreshing = False
+
+
+def devices(braket_client=None):
+    """Return the devices visible to the Braket client as a dict from ARN to device description.
+    The catalog of a client is fetched once and refreshed in the background after DEVICE_CATALOG_TTL seconds, so
+    callers are answered from memory. A refresh that fails keeps the last catalog, and a failed first fetch is raised
+    again for DEVICE_CATALOG_RETRY seconds, so an outage of the API does not slow down every request. Without a client
+    the one of the AWS account of the service is used."""
+    if braket_client is None:
+        from app import braket_handler
+        braket_client = braket_handler.get_clients()[0]
+    # the clients are cached per credentials, region and endpoint, so every client is its own catalog scope
+    with _lock:
+        catalog = _catalogs.get(braket_client)
+        if catalog is not None and not catalog.refreshing \
+                and time.monotonic() - catalog.fetched_at > app.config['DEVICE_CATALOG_TTL']:
+            catalog.refreshing = True
+            threading.Thread(target=_refresh, args=(braket_client, catalog), daemon=True).start()
+    if catalog is None:
+        with _lock:
+            failure = _failures.get(braket_client)
+        if failure is not None and time.monotonic() - failure[0] < app.config['DEVICE_CATALOG_RETRY']:
+            raise failure[1].with_traceback(None)
+        try:
+            catalog = _Catalog(fetch(braket_client))
+        except Exception as e:
+            error = CatalogError(f"The device catalog could not be fetched: {e}")
+            with _lock:
+                _failures[braket_client] = (time.monotonic(), error)
+            raise error from e
+        with _lock:
+            _failures.pop(braket_client, None)
+            catalog = _catalogs.setdefault(braket_client, catalog)
+    return catalog.devices
+
+
+def get(arn, braket_client=None):
+    """Return the description of the device or None if the client cannot see it."""
+    return devices(braket_client).get(arn)
+
+
+def validate(arn, qubit_count, braket_client=None):
+    """Raise a ValueError if the device does not exist, accepts no quantum tasks or has fewer qubits."""
+    device = get(arn, braket_client)
+    if device is None:
+        raise ValueError(f"The device {arn} does not exist.")
+    if device['status'] in UNAVAILABLE_STATUSES:
+        raise ValueError(f"The device {arn} is {device['status'].lower()}.")
+    if device['qubit-count'] is not None and qubit_count > device['qubit-count']:
+        raise ValueError(f"The circuit needs {qubit_count} qubits, but the device {arn} has only "
+                         f"{device['qubit-count']}.")
+
+
+def fetch(braket_client):
+    """Fetch all devices and their capabilities from the Braket API."""
+    summaries = []
+    kwargs = {'filters': []}
+    while True:
+        response = braket_client.search_devices(**kwargs)
+        summaries.extend(response['devices'])
+        if not response.get('nextToken'):
+            break
+        kwargs['nextToken'] = response['nextToken']
+    if not summaries:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(len(summaries), app.config['S3_MAX_POOL_CONNECTIONS'])) as executor:
+        descriptions = executor.map(lambda summary: _fetch_device(braket_client, summary), summaries)
+        return {description['arn']: description for description in descriptions}
+
+
+def _fetch_device(braket_client, summary):
+    # a device whose details cannot be fetched or parsed is described by its summary without capabilities, so it
+    # neither hides the other devices nor is rejected for its qubit count
+    try:
+        return _describe(braket_client.get_device(deviceArn=summary['deviceArn']))
+    except Exception:
+        logging.exception(f"Describing the device {summary['deviceArn']} failed")
+        return _describe(dict(summary, deviceCapabilities=None))
+
+
+def _refresh(braket_client, catalog):
+    try:
+        refreshed = _Catalog(fetch(braket_client))
+    except Exception:
+        logging.exception("Refreshing the device catalog failed")
+        # the stale catalog is kept and the refresh is retried after another TTL
+        with _lock:
+            catalog.fetched_at = time.monotonic()
+            catalog.refreshing = False
+        return
+    with _lock:
+        _catalogs[braket_client] = refreshed
+
+
+def _describe(device):
+    capabilities = device.get('deviceCapabilities') or {}
+    if isinstance(capabilities, str):
+        capabilities = json.loads(capabilities)
+    paradigm = capabilities.get('paradigm') or {}
+    operations = set()
+    result_types = set()
+    for action in (capabilities.get('action') or {}).values():
+        operations.update(action.get('supportedOperations') or [])
+        result_types.update(result_type['name'] for result_type in action.get('supportedResultTypes') or [])
+    return {
+        'arn': device['deviceArn'],
+        'name': device.get('deviceName'),
+        'provider': device.get('providerName'),
+        'type': device.get('deviceType'),
+        'status': device.get('deviceStatus'),
+        'qubit-count': paradigm.get('qubitCount'),
+        'native-gates': sorted(paradigm.get('nativeGateSet') or []),
+        'supported-operations': sorted(operations),
+        'supported-result-types': sorted(result_types),
+    }
@@ -0,0 +1,191 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+import hashlib
+import json
+import os
+import tempfile
+import time
+from email.utils import parsedate_to_datetime
+from urllib import error
+
+import urllib3
+
+from app import app
+from app.lru_cache import LRUCache
+
+_pool = urllib3.PoolManager(
+    maxsize=app.config["DOWNLOAD_POOL_SIZE"],
+    timeout=urllib3.Timeout(connect=10.0, read=60.0),
+    retries=urllib3.Retry(total=2, redirect=5, raise_on_status=False),
+)
+_memory = LRUCache(app.config["DOWNLOAD_CACHE_SIZE"], app.config["DOWNLOAD_CACHE_MAX_BYTES"],
+                   sizeof=lambda entry: len(entry.body))
+
+
+class CachedDownload:
+    def __init__(self, body, etag=None, last_modified=None, expires=0.0):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires = expires
+
+    def is_fresh(self):
+        return time.time() < self.expires
+
+    def has_validators(self):
+        return bool(self.etag or self.last_modified)
+
+    def to_json(self):
+        return {'etag': self.etag, 'last_modified': self.last_modified, 'expires': self.expires}
+
+
+def fetch(url: str, bearer_token: str = "") -> bytes:
+    """Return the content of url. Cached copies are served while fresh and revalidated with a conditional GET
+    afterwards. Entries are keyed by URL and bearer token, so tenants never see each other's downloads."""
+    key = _cache_key(url, bearer_token)
+    entry = _memory.get(key) or _read_from_disk(key)
+    if entry is not None and entry.is_fresh():
+        return entry.body
+
+    headers = {}
+    if bearer_token:
+        headers["Authorization"] = "Bearer " + bearer_token
+    if entry is not None:
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+
+    try:
+        res = _pool.request("GET", url, headers=headers)
+    except urllib3.exceptions.HTTPError as e:
+        raise error.URLError(str(e))
+
+    if res.status == 304 and entry is not None:
+        max_age = _max_age(res.headers)
+        if max_age is not None:
+            entry.expires = time.time() + max_age
+            _store(key, entry)
+        return entry.body
+    if res.status != 200:
+        raise error.HTTPError(url, res.status, res.reason, res.headers, None)
+
+    max_age = _max_age(res.headers)
+    entry = CachedDownload(res.data, res.headers.get("ETag"), res.headers.get("Last-Modified"),
+                           time.time() + (max_age or 0))
+    if max_age is not None and (max_age > 0 or entry.has_validators()):
+        _store(key, entry)
+    return entry.body
+
+
+def _cache_key(url, bearer_token):
+    return hashlib.sha256(f"{url}\n{bearer_token}".encode("utf-8")).hexdigest()
+
+
+def _max_age(headers):
+    """Return the freshness lifetime of a response in seconds, or None if it must not be stored."""
+    directives = {}
+    for directive in headers.get("Cache-Control", "").split(","):
+        name, _, value = directive.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"')
+    if "no-store" in directives:
+        return None
+    if "no-cache" in directives:
+        return 0
+    age = _to_int(headers.get("Age")) or 0
+    if "max-age" in directives:
+        max_age = _to_int(directives["max-age"])
+        return max(0, max_age - age) if max_age is not None else 0
+    if "Expires" in headers:
+        try:
+            expires = parsedate_to_datetime(headers["Expires"]).timestamp()
+        except (TypeError, ValueError):
+            return 0
+        return max(0, expires - time.time())
+    return 0
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _store(key, entry):
+    _memory.put(key, entry)
+    cache_dir = app.config["DOWNLOAD_CACHE_DIR"]
+    if not cache_dir:
+        return
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        _write_atomically(os.path.join(cache_dir, key), entry.body)
+        _write_atomically(os.path.join(cache_dir, key + ".json"), json.dumps(entry.to_json()).encode("utf-8"))
+        _prune_disk(cache_dir)
+    except OSError as e:
+        app.logger.warning("Could not write download cache: " + str(e))
+
+
+def _read_from_disk(key):
+    cache_dir = app.config["DOWNLOAD_CACHE_DIR"]
+    if not cache_dir:
+        return None
+    try:
+        with open(os.path.join(cache_dir, key + ".json")) as f:
+            meta = json.load(f)
+        with open(os.path.join(cache_dir, key), "rb") as f:
+            body = f.read()
+    except (OSError, ValueError):
+        return None
+    entry = CachedDownload(body, meta.get("etag"), meta.get("last_modified"), meta.get("expires", 0.0))
+    _memory.put(key, entry)
+    return entry
+
+
+def _write_atomically(path, data):
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except OSError:
+        os.unlink(temp_path)
+        raise
+
+
+def _prune_disk(cache_dir):
+    """Delete the least recently written downloads once the disk tier exceeds its size limit."""
+    files = []
+    total_size = 0
+    with os.scandir(cache_dir) as entries:
+        for dir_entry in entries:
+            if dir_entry.is_file() and not dir_entry.name.endswith(".json"):
+                stat = dir_entry.stat()
+                files.append((stat.st_mtime, stat.st_size, dir_entry.path))
+                total_size += stat.st_size
+    for _, size, path in sorted(files):
+        if total_size <= app.config["DOWNLOAD_CACHE_DISK_MAX_BYTES"]:
+            break
+        for stale_path in (path, path + ".json"):
+            try:
+                os.remove(stale_path)
+            except OSError:
+                pass
+        total_size -= size
@@ -18,6 +18,7 @@
 # ******************************************************************************
 
 from flask import make_response, jsonify
+from werkzeug.exceptions import BadRequest, TooManyRequests
 from app import app
 
 
@@ -33,9 +34,23 @@ def not_found(error):
 
 @app.errorhandler(400)
 def bad_request(error):
-    return make_response(jsonify({'error': 'Bad Request', 'statusCode': '400'}), 400)
+    body = {'error': 'Bad Request', 'statusCode': '400'}
+    if error.description != BadRequest.description:
+        body['message'] = error.description
+    return make_response(jsonify(body), 400)
 
 
 @app.errorhandler(401)
 def unauthorized(error):
     return make_response(jsonify({"error": "Unauthorized", "statusCode": "401"}), 401)
+
+
+@app.errorhandler(429)
+def too_many_requests(error):
+    body = {'error': 'Too Many Requests', 'statusCode': '429'}
+    if error.description != TooManyRequests.description:
+        body['message'] = error.description
+    response = make_response(jsonify(body), 429)
+    if getattr(error, 'retry_after', None):
+        response.headers['Retry-After'] = str(error.retry_after)
+    return response
@@ -16,53 +16,58 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 # ******************************************************************************
-import urllib
-from urllib import request, error
-import tempfile
-import os, sys, shutil
-from importlib import reload
+import urllib.parse
+from urllib import error
+import builtins
+import hashlib
+from functools import reduce
+from itertools import chain
+from operator import mul
 
 import numpy as np
 from braket.circuits import Circuit, Observable
 from flask_restful import abort
 from braket.ir.jaqcd import Program
-from urllib3 import HTTPResponse
 
-from app import app
+from app import app, circuit_cache, download_cache, metrics
+from app.lru_cache import LRUCache
+
+_compiled_implementations = LRUCache(app.config["IMPLEMENTATION_CACHE_SIZE"])
+_decoded_matrices = LRUCache(app.config["MATRIX_CACHE_SIZE"], app.config["MATRIX_CACHE_MAX_BYTES"],
+                             sizeof=lambda matrix: matrix.nbytes)
+_MIN_CACHED_MATRIX_VALUES = 2 * 16 * 16
 
 
 def prepare_code_from_data(data, input_params):
     """Get implementation code from data. Set input parameters into implementation. Return circuit."""
-    temp_dir = tempfile.mkdtemp()
-    with open(os.path.join(temp_dir, "__init__.py"), "w") as f:
-        f.write("")
-    with open(os.path.join(temp_dir, "downloaded_code.py"), "w") as f:
-        f.write(data)
-    sys.path.append(temp_dir)
-    try:
-        import downloaded_code
-
-        # deletes every attribute from downloaded_code, except __name__, because importlib.reload
-        # doesn't reset the module's global variables
-        for attr in dir(downloaded_code):
-            if attr != "__name__":
-                delattr(downloaded_code, attr)
-
-        reload(downloaded_code)
-        if 'get_circuit' in dir(downloaded_code):
-            circuit = downloaded_code.get_circuit(**input_params)
-        elif 'qc' in dir(downloaded_code):
-            circuit = downloaded_code.qc
-        elif 'p' in dir(downloaded_code):
-            circuit = downloaded_code.p
-        elif 'c' in dir(downloaded_code):
-            circuit = downloaded_code.c
-    finally:
-        sys.path.remove(temp_dir)
-        shutil.rmtree(temp_dir, ignore_errors=True)
-    if not circuit:
+    return prepare_circuits_from_data(data, [input_params])[0]
+
+
+def prepare_circuits_from_data(data, points):
+    """Get implementation code from data and return a circuit for every set of input parameters.
+    The code runs once, only its get_circuit function is called per set of input parameters."""
+    # every call runs the compiled code in a fresh namespace, so concurrent requests don't share module globals
+    namespace = {"__name__": "downloaded_code", "__builtins__": builtins}
+    with metrics.stage("compile"):
+        exec(_compile_implementation(data), namespace)
+        if 'get_circuit' in namespace:
+            circuits = [namespace['get_circuit'](**input_params) for input_params in points]
+        else:
+            circuit = namespace.get('qc') or namespace.get('p') or namespace.get('c')
+            circuits = [circuit] * len(points)
+    if not all(circuits):
         raise ValueError
-    return circuit
+    return circuits
+
+
+def _compile_implementation(data):
+    """Return the code object of an implementation, compiling each distinct source only once."""
+    key = hashlib.sha256(data.encode("utf-8")).hexdigest()
+    code = _compiled_implementations.get(key)
+    if code is None:
+        code = compile(data, "downloaded_code.py", "exec")
+        _compiled_implementations.put(key, code)
+    return code
 
 
 def prepare_code_from_url(url, input_params, bearer_token: str = ""):
@@ -77,6 +82,17 @@ def prepare_code_from_url(url, input_params, bearer_token: str = ""):
 
 
 def prepare_code_from_braket_ir(braket_ir):
+    """Get circuit from Braket-IR. Identical IRs are only parsed once and served from the circuit cache."""
+    with metrics.stage("parse"):
+        key = circuit_cache.ir_hash(braket_ir)
+        circuit = circuit_cache.get(key)
+        if circuit is None:
+            circuit = _build_circuit_from_braket_ir(braket_ir)
+            circuit_cache.put(key, circuit)
+    return circuit
+
+
+def _build_circuit_from_braket_ir(braket_ir):
     ir = Program.parse_raw(braket_ir)
     instructions = ir.instructions
     circuit = Circuit()
@@ -88,21 +104,10 @@ def prepare_code_from_braket_ir(braket_ir):
         kwargs = {}
         # Special cases for gates that interact with matrices, since they have special target syntax
         if hasattr(inst, "matrices"):
-            matrices = inst.matrices.copy()
-            reformed_matrices = []
-            for matrix in matrices:
-                for row in matrix:
-                    for i in range(len(row)):
-                        row[i] = np.complex(row[i][0], row[i][1])
-                reformed_matrices.append(np.array(matrix))
             args.append(inst.targets)
-            kwargs["matrices"] = reformed_matrices
+            kwargs["matrices"] = list(_decode_complex_matrix(inst.matrices))
         elif hasattr(inst, "matrix"):
-            matrix = inst.matrix.copy()
-            for row in matrix:
-                for i in range(len(row)):
-                    row[i] = np.complex(row[i][0], row[i][1])
-            kwargs["matrix"] = np.array(matrix)
+            kwargs["matrix"] = _decode_complex_matrix(inst.matrix)
             kwargs["targets"] = inst.targets
         else:
             # Adding of parameters to args and kwargs respectively
@@ -159,6 +164,38 @@ def prepare_code_from_braket_ir(braket_ir):
     return circuit
 
 
+def _decode_complex_matrix(matrix):
+    """Decode nested [re, im] pairs into a read-only complex128 array using a single array construction.
+    Equal matrices share one cached array, e.g. when a unitary is repeated throughout a circuit."""
+    shape = []
+    entry = matrix
+    while isinstance(entry, list):
+        shape.append(len(entry))
+        entry = entry[0] if entry else None
+    values = matrix
+    for _ in range(len(shape) - 1):
+        values = chain.from_iterable(values)
+    values = iter(values)
+    count = reduce(mul, shape)
+    pairs = np.fromiter(values, dtype=np.float64, count=count).reshape(shape)
+    if next(values, None) is not None or shape[-1] != 2:
+        raise ValueError("Matrix entries must be [re, im] pairs of equally sized rows.")
+
+    # the trailing [re, im] axis is contiguous, so it can be reinterpreted as complex128 without copying
+    decoded = pairs.view(np.complex128)[..., 0]
+    decoded.flags.writeable = False
+    if count < _MIN_CACHED_MATRIX_VALUES:
+        # small matrices are cheaper to decode than to hash
+        return decoded
+
+    key = hashlib.sha1(pairs.data).hexdigest() + str(shape)
+    cached = _decoded_matrices.get(key)
+    if cached is None:
+        _decoded_matrices.put(key, decoded)
+        return decoded
+    return cached
+
+
 def prepare_code_from_braket_ir_url(url, bearer_token: str = ""):
     """Get implementation code from URL. Set input parameters into implementation. Return circuit."""
     try:
@@ -169,10 +206,17 @@ def prepare_code_from_braket_ir_url(url, bearer_token: str = ""):
     return prepare_code_from_braket_ir(impl)
 
 
-def _download_code(url: str, bearer_token: str = "") -> str:
-    req = request.Request(url)
+def get_implementation_from_url(url, bearer_token: str = ""):
+    """Get implementation code or Braket-IR from URL without preparing a circuit."""
+    try:
+        return _download_code(url, bearer_token)
+    except (error.HTTPError, error.URLError):
+        return None
 
-    if urllib.parse.urlparse(url).netloc == "platform.planqk.de":
+
+def _download_code(url: str, bearer_token: str = "") -> str:
+    is_planqk = urllib.parse.urlparse(url).netloc == "platform.planqk.de"
+    if is_planqk:
         if bearer_token == "":
             app.logger.error("No bearer token specified, download from the PlanQK platform will fail.")
 
@@ -181,21 +225,23 @@ def _download_code(url: str, bearer_token: str = "") -> str:
             app.logger.error("The bearer token MUST NOT start with \"Bearer\".")
 
             abort(401)
-
-        req.add_header("Authorization", "Bearer " + bearer_token)
+    else:
+        bearer_token = ""
 
     try:
-        res: HTTPResponse = request.urlopen(req)
-    except Exception as e:
+        with metrics.stage("download"):
+            impl = download_cache.fetch(url, bearer_token)
+    except error.HTTPError as e:
         app.logger.error("Could not open url: " + str(e))
 
-        if str(e).find("401") != -1:
+        if e.code == 401:
             abort(401)
+        raise
+    except error.URLError as e:
+        app.logger.error("Could not open url: " + str(e))
+        raise
 
-    if res.getcode() == 200 and urllib.parse.urlparse(url).netloc == "platform.planqk.de":
+    if is_planqk:
         app.logger.info("Request to platform.planqk.de was executed successfully.")
 
-    if res.getcode() == 401:
-        abort(401)
-
-    return res.read().decode("utf-8")
+    return impl.decode("utf-8")
@@ -0,0 +1,39 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+import rq
+
+from app import app
+
+# tiers of the execution jobs from the cheapest to the most expensive local simulations, and the jobs for QPUs
+TIERS = ("small", "medium", "large", "remote")
+
+
+def name(tier):
+    """Return the name of the queue of the tier. The medium queue keeps the name of the former single execution
+    queue, so jobs that were queued before the tiers were introduced are still executed."""
+    if tier == "medium":
+        return "braket-service_execute"
+    return "braket-service_execute-" + tier
+
+
+def create(connection):
+    """Return the queues of all tiers, each with the job timeout of its tier."""
+    return {tier: rq.Queue(name(tier), connection=connection,
+                           default_timeout=app.config[tier.upper() + '_QUEUE_TIMEOUT'])
+            for tier in TIERS}
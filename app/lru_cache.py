@@ -0,0 +1,79 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+from collections import OrderedDict
+from threading import Lock
+
+
+class LRUCache:
+    """Thread-safe in-process cache bounded by entry count and, optionally, by the total size of its values."""
+
+    def __init__(self, max_entries, max_size=None, sizeof=len):
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.sizeof = sizeof
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        """Return the cached value and mark it as most recently used."""
+        with self._lock:
+            try:
+                value, _ = self._entries[key]
+            except KeyError:
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        """Add or replace a value and evict the least recently used entries that exceed the bounds."""
+        if self.max_entries <= 0:
+            return
+        size = self.sizeof(value) if self.max_size is not None else 0
+        if self.max_size is not None and size > self.max_size:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.size -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.size += size
+            while len(self._entries) > self.max_entries or \
+                    (self.max_size is not None and self.size > self.max_size):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            value, size = self._entries.pop(key)
+            self.size -= size
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,129 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import contextvars
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from app import app
+
+# stages of the execution jobs, every one is exported as a histogram of its durations
+STAGES = ("queue-wait", "download", "parse", "compile", "noise", "simulation", "submission", "commit")
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+_KEY_PREFIX = "braket-service:metrics:"
+
+# the timings of the job that runs in the current context, None outside of jobs
+_timings = contextvars.ContextVar("job_timings", default=None)
+
+
+def start(job):
+    """Start recording the stage timings of the job in the current context, beginning with its queue wait."""
+    timings = {}
+    _timings.set(timings)
+    if job and job.enqueued_at:
+        enqueued_at = job.enqueued_at.replace(tzinfo=None)
+        timings['enqueued-at'] = enqueued_at.isoformat() + 'Z'
+        record('queue-wait', (datetime.utcnow() - enqueued_at).total_seconds())
+    return timings
+
+
+def current():
+    """Return the timings of the job of the current context or None."""
+    return _timings.get()
+
+
+@contextmanager
+def stage(name):
+    """Measure the duration of the enclosed code as the stage of that name. Outside of jobs, e.g. in the requests of
+    /transpile, nothing is measured, so the web tier does not pay a round trip and the histograms only hold jobs."""
+    if _timings.get() is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+def record(name, seconds):
+    """Add the duration to the timings and the histogram of the stage if the current context runs a job."""
+    timings = _timings.get()
+    if timings is None:
+        return
+    timings[name] = round(timings.get(name, 0) + seconds, 6)
+    try:
+        # the histograms are shared by all web and worker processes, each observation is one round trip
+        key = _KEY_PREFIX + name
+        pipeline = app.redis.pipeline(transaction=False)
+        for bucket in BUCKETS:
+            if seconds <= bucket:
+                pipeline.hincrby(key, str(bucket), 1)
+        pipeline.hincrby(key, "count", 1)
+        pipeline.hincrbyfloat(key, "sum", seconds)
+        pipeline.execute()
+    except Exception as e:
+        app.logger.warning(f"Could not record the duration of stage {name}: {e}")
+
+
+def render():
+    """Return the histograms of all stages, the queue depths and the worker utilization in the Prometheus text
+    format."""
+    from rq import Worker
+    from rq.registry import StartedJobRegistry
+
+    lines = ["# HELP braket_service_stage_seconds Duration of the stages of the execution jobs.",
+             "# TYPE braket_service_stage_seconds histogram"]
+    pipeline = app.redis.pipeline(transaction=False)
+    for name in STAGES:
+        pipeline.hgetall(_KEY_PREFIX + name)
+    for name, values in zip(STAGES, pipeline.execute()):
+        values = {key.decode(): value.decode() for key, value in values.items()}
+        for bucket in BUCKETS:
+            lines.append(f'braket_service_stage_seconds_bucket{{stage="{name}",le="{bucket}"}} '
+                         f'{values.get(str(bucket), 0)}')
+        lines.append(f'braket_service_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {values.get("count", 0)}')
+        lines.append(f'braket_service_stage_seconds_sum{{stage="{name}"}} {float(values.get("sum", 0))}')
+        lines.append(f'braket_service_stage_seconds_count{{stage="{name}"}} {values.get("count", 0)}')
+
+    queues = app.execute_queues
+    lines += ["# HELP braket_service_queue_depth Jobs waiting in the execution queue of every tier.",
+              "# TYPE braket_service_queue_depth gauge"]
+    lines += [f'braket_service_queue_depth{{tier="{tier}"}} {len(queue)}' for tier, queue in queues.items()]
+    lines += ["# HELP braket_service_jobs_running Jobs of every tier that are executed by a worker.",
+              "# TYPE braket_service_jobs_running gauge"]
+    lines += [f'braket_service_jobs_running{{tier="{tier}"}} {len(StartedJobRegistry(queue=queue))}'
+              for tier, queue in queues.items()]
+
+    workers = Worker.all(connection=app.redis)
+    busy = sum(1 for worker in workers if worker.get_state() == 'busy')
+    lines += ["# HELP braket_service_workers Workers of the execution queues by state.",
+              "# TYPE braket_service_workers gauge",
+              f'braket_service_workers{{state="busy"}} {busy}',
+              f'braket_service_workers{{state="idle"}} {len(workers) - busy}',
+              "# HELP braket_service_worker_utilization Share of the workers that execute a job.",
+              "# TYPE braket_service_worker_utilization gauge",
+              f"braket_service_worker_utilization {busy / len(workers) if workers else 0}",
+              "# HELP braket_service_worker_working_seconds_total Time the workers spent executing jobs.",
+              "# TYPE braket_service_worker_working_seconds_total counter",
+              f"braket_service_worker_working_seconds_total "
+              f"{sum(worker.total_working_time or 0 for worker in workers)}"]
+    return "\n".join(lines) + "\n"
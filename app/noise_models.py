@@ -0,0 +1,107 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import json
+
+
+class NoiseModel:
+    """Depolarizing noise of a local simulation. gate, readout and initialization are the probabilities applied after
+    every gate, before every measurement and after the initialization of every qubit, gates maps gate names to
+    probabilities that replace the gate probability for those gates."""
+
+    def __init__(self, gate=0.0, readout=0.0, initialization=0.0, gates=None):
+        self.gate = gate
+        self.readout = readout
+        self.initialization = initialization
+        self.gates = gates or {}
+
+    @property
+    def is_noiseless(self):
+        return not (self.gate or self.readout or self.initialization or any(self.gates.values()))
+
+    @property
+    def name(self):
+        """Canonical description of the noise model, equal for equal noise models."""
+        if self.is_noiseless:
+            return "none"
+        return json.dumps({"gate": self.gate, "readout": self.readout, "initialization": self.initialization,
+                           "gates": {gate: p for gate, p in self.gates.items() if p}}, sort_keys=True)
+
+    def apply(self, circuit):
+        """Apply the noise to the circuit in place."""
+        from braket.circuits import Gate, Noise
+
+        if self.gate and not self.gates:
+            circuit.apply_gate_noise(Noise.Depolarizing(probability=self.gate))
+        elif self.gate:
+            other_gates = [gate for name, gate in _gate_types(Gate).items() if name not in self.gates]
+            circuit.apply_gate_noise(Noise.Depolarizing(probability=self.gate), target_gates=other_gates)
+        for name, probability in self.gates.items():
+            if probability:
+                circuit.apply_gate_noise(Noise.Depolarizing(probability=probability),
+                                         target_gates=[_gate_types(Gate)[name]])
+        if self.readout:
+            circuit.apply_readout_noise(Noise.Depolarizing(probability=self.readout))
+        if self.initialization:
+            circuit.apply_initialization_noise(Noise.Depolarizing(probability=self.initialization))
+        return circuit
+
+
+# noise of all local simulations that do not specify a noise model
+DEFAULT = NoiseModel(gate=0.1, readout=0.1, initialization=0.1)
+
+NOISELESS = NoiseModel()
+
+
+def parse(spec):
+    """Return the noise model of a request. spec is "none", "default", or a mapping with type "depolarizing", the
+    probabilities "gate", "readout" and "initialization", and optionally "gates" mapping gate names to probabilities.
+    Raise a ValueError for invalid specifications."""
+    if spec is None or spec == "default":
+        return DEFAULT
+    if spec == "none":
+        return NOISELESS
+    if not isinstance(spec, dict) or spec.get("type", "depolarizing") != "depolarizing":
+        raise ValueError("Unsupported noise model: " + str(spec))
+    unknown = set(spec) - {"type", "gate", "readout", "initialization", "gates"}
+    if unknown:
+        raise ValueError("Unknown noise model fields: " + ", ".join(sorted(unknown)))
+    gates = spec.get("gates") or {}
+    if not isinstance(gates, dict):
+        raise ValueError("gates must map gate names to probabilities.")
+    from braket.circuits import Gate
+    gate_types = _gate_types(Gate)
+    for name in gates:
+        if name.lower() not in gate_types:
+            raise ValueError("Unknown gate in noise model: " + name)
+    return NoiseModel(_probability(spec.get("gate", 0.0)), _probability(spec.get("readout", 0.0)),
+                      _probability(spec.get("initialization", 0.0)),
+                      {name.lower(): _probability(p) for name, p in gates.items()})
+
+
+def _probability(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value <= 0.75:
+        raise ValueError("Depolarizing probabilities must be numbers between 0 and 0.75, got " + str(value))
+    return float(value)
+
+
+def _gate_types(gate_class):
+    """Return the gate classes of braket by their lower case names, which are the instruction types of Braket-IR."""
+    return {name.lower(): value for name, value in vars(gate_class).items()
+            if isinstance(value, type) and issubclass(value, gate_class)}
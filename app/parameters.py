@@ -16,6 +16,23 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 # ******************************************************************************
+import itertools
+import json
+
+
+def _array_of(t):
+    """
+        Returns a conversion to a list of the given type, accepting lists, JSON arrays and comma separated values
+    """
+    def convert(value):
+        if isinstance(value, str):
+            value = value.strip()
+            if value.startswith("["):
+                value = json.loads(value)
+            else:
+                value = [v for v in value.split(",") if v.strip()]
+        return [t(v.strip() if isinstance(v, str) else v) for v in value]
+    return convert
 
 
 class ParameterDictionary(dict):
@@ -27,7 +44,10 @@ class ParameterDictionary(dict):
         "String" : str,
         "Integer" : int,
         "Float" : float,
-        "Unknown" : str
+        "Unknown" : str,
+        "StringArray" : _array_of(str),
+        "IntegerArray" : _array_of(int),
+        "FloatArray" : _array_of(float)
     }
 
     """
@@ -75,4 +95,23 @@ class ParameterDictionary(dict):
         else:
             t_value = value
 
-        super(ParameterDictionary, self).__setitem__(key.lower(), t_value)
\ No newline at end of file
+        super(ParameterDictionary, self).__setitem__(key.lower(), t_value)
+
+    """
+        Returns the parameter sets of a sweep over all array-valued parameters. In "grid" mode the cartesian product
+        of the arrays is swept, in "zip" mode the arrays are swept element-wise and must have equal lengths.
+        Scalar parameters are the same for every parameter set.
+    """
+    def sweep_points(self, mode):
+
+        scalars = {k: v for k, v in self.items() if not isinstance(v, list)}
+        arrays = {k: v for k, v in self.items() if isinstance(v, list)}
+        if mode == "grid":
+            combinations = itertools.product(*arrays.values())
+        elif mode == "zip":
+            if len({len(v) for v in arrays.values()}) > 1:
+                raise ValueError("All array parameters of a zip sweep must have the same length.")
+            combinations = zip(*arrays.values())
+        else:
+            raise ValueError("Unknown sweep mode " + str(mode))
+        return [dict(scalars, **dict(zip(arrays.keys(), combination))) for combination in combinations]
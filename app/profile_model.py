@@ -0,0 +1,36 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+from datetime import datetime
+
+from sqlalchemy.orm import deferred
+
+from app import db
+
+
+class Profile(db.Model):
+    """The profile of a profiled request, see profiling. Profiles of executions have the id of their result."""
+    id = db.Column(db.String(36), primary_key=True)
+    # the statistics in the pstats format and their text report
+    stats = deferred(db.Column(db.LargeBinary))
+    report = deferred(db.Column(db.Text))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return 'Profile {}'.format(self.id)
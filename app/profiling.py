@@ -0,0 +1,194 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+import contextvars
+import cProfile
+import io
+import marshal
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from app import app
+
+# the profile of the request or job that runs in the current context, None unless profiling was requested
+_session = contextvars.ContextVar("profile_session", default=None)
+
+# tracemalloc traces the whole process, so only the profiles of jobs, whose workers run one job at a time, trace
+# allocations. It runs while at least one of them is recorded unless it was started by someone else, e.g. with
+# PYTHONTRACEMALLOC
+_tracing_lock = threading.Lock()
+_tracing_sessions = 0
+_started_tracing = False
+
+
+class Profile:
+    """The cProfile statistics of the profiled sections of one request or job and, if traced, the allocations made
+    meanwhile."""
+
+    def __init__(self, trace_memory=False):
+        self.profilers = []
+        self.started = time.perf_counter()
+        self.wall_time = None
+        self.trace_memory = trace_memory
+        self.snapshot = None
+        self.peak_memory = 0
+        if trace_memory:
+            _start_tracing()
+
+    def stop(self):
+        """Stop tracing allocations and keep the allocations that are still alive."""
+        if self.wall_time is None:
+            self.wall_time = time.perf_counter() - self.started
+            if self.trace_memory:
+                self.snapshot = tracemalloc.take_snapshot()
+                self.peak_memory = tracemalloc.get_traced_memory()[1]
+                _stop_tracing()
+
+    def stats(self):
+        """Return the statistics of all profiled sections in the format of pstats.Stats.dump_stats."""
+        return marshal.dumps(self._merged_stats().stats)
+
+    def report(self):
+        """Return the text report of the functions with the highest cumulative time and the largest allocations."""
+        lines = app.config['PROFILE_REPORT_LINES']
+        stream = io.StringIO()
+        stream.write(f"Wall time: {self.wall_time or 0:.3f} s\n")
+        if self.trace_memory:
+            stream.write(f"Peak traced memory: {self.peak_memory / 1024 ** 2:.1f} MiB\n")
+        stream.write("\n")
+        stats = self._merged_stats(stream)
+        if stats.stats:
+            stats.sort_stats("cumulative").print_stats(lines)
+        if self.snapshot is not None:
+            stream.write("\nLargest allocations still alive at the end of the profile:\n")
+            for statistic in self.snapshot.statistics("lineno")[:lines]:
+                stream.write(f"{statistic}\n")
+        return stream.getvalue()
+
+    def _merged_stats(self, stream=None):
+        stats = pstats.Stats(stream=stream)
+        for profiler in self.profilers:
+            profiler.create_stats()
+            if profiler.stats:
+                stats.add(profiler)
+        return stats
+
+
+def start(enabled, trace_memory=False):
+    """Start profiling the current context if enabled, with tracing of allocations if trace_memory is set. The
+    unfinished profile of an earlier job of the same context, e.g. of a job that failed, is dropped."""
+    finish()
+    profile = Profile(trace_memory) if enabled else None
+    _session.set(profile)
+    return profile
+
+
+def finish():
+    """Stop profiling the current context and return its profile, None if it was not profiled."""
+    profile = _session.get()
+    if profile is not None:
+        _session.set(None)
+        profile.stop()
+    return profile
+
+
+def current():
+    """Return the profile of the current context or None."""
+    return _session.get()
+
+
+@contextmanager
+def section():
+    """Profile the enclosed code if the current context is profiled. Without a profile it only costs a lookup."""
+    profile = _session.get()
+    if profile is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # another profiler is active, e.g. a nested section
+        yield
+        return
+    profile.profilers.append(profiler)
+    try:
+        yield
+    finally:
+        profiler.disable()
+
+
+def call_in_child(function, *args):
+    """Call the function in a child process forked from a profiled context and return its result with the statistics
+    of the call, which the parent adds to its profile with add. Without a profile the statistics are None."""
+    if _session.get() is None:
+        return function(*args), None
+    # the child inherited the profiler and the allocation tracing of the parent's section, both only record there
+    sys.setprofile(None)
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        return function(*args), None
+    try:
+        result = function(*args)
+    finally:
+        profiler.disable()
+    profiler.create_stats()
+    return result, profiler.stats
+
+
+def add(stats):
+    """Add the statistics returned by call_in_child to the profile of the current context."""
+    profile = _session.get()
+    if profile is not None and stats:
+        profile.profilers.append(_ChildStats(stats))
+
+
+class _ChildStats:
+    """Statistics recorded in another process, in the form pstats.Stats.add accepts."""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def _start_tracing():
+    global _tracing_sessions, _started_tracing
+    with _tracing_lock:
+        if _tracing_sessions == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracing = True
+        _tracing_sessions += 1
+
+
+def _stop_tracing():
+    global _tracing_sessions, _started_tracing
+    with _tracing_lock:
+        _tracing_sessions -= 1
+        if _tracing_sessions == 0 and _started_tracing:
+            tracemalloc.stop()
+            _started_tracing = False
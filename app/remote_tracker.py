@@ -0,0 +1,165 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from app import app, braket_handler, db, result_notifications
+from app.result_model import Result
+
+_TERMINAL_STATES = ("COMPLETED", "FAILED", "CANCELLED")
+
+# quantum tasks may be listed with a slightly earlier creation time than the one recorded on submission
+_CLOCK_SKEW = timedelta(minutes=5)
+
+
+async def run(braket_client, s3_client, stop: asyncio.Event = None):
+    """Poll all outstanding quantum tasks until stopped and store the results of the finished ones.
+    The polling interval doubles while no task finishes and is reset as soon as one finishes or a new one appears."""
+    interval = app.config['TRACKER_MIN_INTERVAL']
+    known = set()
+    while not (stop and stop.is_set()):
+        try:
+            outstanding = _outstanding()
+            finished = await poll(braket_client, s3_client, outstanding)
+        except Exception:
+            logging.exception('Polling the quantum tasks failed')
+            outstanding, finished = {}, 0
+        if finished or not outstanding or not set(outstanding).issubset(known):
+            interval = app.config['TRACKER_MIN_INTERVAL']
+        else:
+            interval = min(interval * 2, app.config['TRACKER_MAX_INTERVAL'])
+        known = set(outstanding)
+        if stop:
+            try:
+                await asyncio.wait_for(stop.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+        else:
+            await asyncio.sleep(interval)
+
+
+async def poll(braket_client, s3_client, outstanding):
+    """Find the outstanding quantum tasks that reached a final state and store their results. Return the number of
+    stored results. The tasks submitted within the search window are listed with one paginated search, older tasks are
+    looked up one by one, so a task that waits long in the queue of a QPU does not extend the search to every task the
+    account created since."""
+    if not outstanding:
+        return 0
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(app.config['TRACKER_MAX_CONCURRENCY'])
+    window_start = datetime.utcnow() - timedelta(seconds=app.config['TRACKER_SEARCH_WINDOW'])
+    since = max(min(submitted_at for _, submitted_at in outstanding.values()) - _CLOCK_SKEW, window_start)
+    summaries = await loop.run_in_executor(None, _search_finished, braket_client, since)
+
+    async def look_up(task_arn):
+        async with semaphore:
+            return await loop.run_in_executor(None, _get_task, braket_client, task_arn)
+
+    older = [task_arn for task_arn, (_, submitted_at) in outstanding.items() if submitted_at - _CLOCK_SKEW < since]
+    for summary in await asyncio.gather(*(look_up(task_arn) for task_arn in older)):
+        if summary and summary['status'] in _TERMINAL_STATES:
+            summaries[summary['quantumTaskArn']] = summary
+    finished = [(task_arn, result_id, summaries[task_arn])
+                for task_arn, (result_id, _) in outstanding.items() if task_arn in summaries]
+    if not finished:
+        return 0
+
+    async def fetch(summary):
+        if summary['status'] != 'COMPLETED':
+            return {'error': 'quantum task ' + summary['status'].lower()}
+        async with semaphore:
+            try:
+                return await loop.run_in_executor(None, braket_handler.get_remote_result, s3_client,
+                                                  summary['outputS3Bucket'], summary['outputS3Directory'])
+            except Exception:
+                logging.exception(f"Reading the result of {summary['quantumTaskArn']} failed")
+                return {'error': 'result not readable'}
+
+    job_results = await asyncio.gather(*(fetch(summary) for _, _, summary in finished))
+    stored = []
+    for (task_arn, result_id, _), job_result in zip(finished, job_results):
+        logging.info(f'Quantum task {task_arn} finished')
+        # results that were canceled meanwhile are left unchanged
+        if Result.finalize(result_id, job_result):
+            stored.append(result_id)
+    parent_ids = {result.parent_id for result in Result.query.filter(Result.id.in_(stored)).all() if result.parent_id}
+    sweeps = complete_sweeps(parent_ids)
+    db.session.commit()
+    for result_id in stored + sweeps:
+        result_notifications.publish(result_id)
+    return len(finished)
+
+
+def complete_sweeps(parent_ids):
+    """Replace the results listed by the unfinished sweeps among the parents with their counts once all of them are
+    stored, and return the ids of the completed sweeps."""
+    completed = []
+    for sweep in Result.query.filter(Result.id.in_(parent_ids), Result.complete.is_(False)).all():
+        pending = sweep.result
+        # batches list no results, they are complete as soon as their tasks are submitted
+        if not pending or 'results' not in pending:
+            continue
+        children = {child.id: child for child in Result.query.filter_by(parent_id=sweep.id).all()}
+        if not all(child.complete for child in children.values()):
+            continue
+        if Result.finalize(sweep.id, {'parameters': pending['parameters'], 'points': pending['points'],
+                                      'counts': [children[child_id].result for child_id in pending['results']]}):
+            completed.append(sweep.id)
+    return completed
+
+
+def _outstanding():
+    """Return the id and submission time of every unfinished remote result by the ARN of its quantum task."""
+    results = Result.query.filter(Result.task_arn.isnot(None), Result.complete.is_(False)).all()
+    db.session.commit()
+    return {result.task_arn: (result.id, result.submitted_at) for result in results}
+
+
+def _get_task(braket_client, task_arn):
+    try:
+        return braket_client.get_quantum_task(quantumTaskArn=task_arn)
+    except Exception:
+        logging.exception(f'Looking up the quantum task {task_arn} failed')
+        return None
+
+
+def _search_finished(braket_client, since):
+    summaries = {}
+    kwargs = {'filters': [{'name': 'createdAt', 'operator': 'GTE', 'values': [since.isoformat()]}]}
+    while True:
+        response = braket_client.search_quantum_tasks(**kwargs)
+        for summary in response['quantumTasks']:
+            if summary['status'] in _TERMINAL_STATES:
+                summaries[summary['quantumTaskArn']] = summary
+        if not response.get('nextToken'):
+            return summaries
+        kwargs['nextToken'] = response['nextToken']
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    with app.app_context():
+        braket_client, s3_client = braket_handler.get_clients()
+        asyncio.run(run(braket_client, s3_client))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,16 +2,18 @@ import marshmallow as ma
 
 
 class TranspilationRequest:
-    def __init__(self, qpu_name, impl_language, impl_url, impl_data, bearer_token, input_params):
+    def __init__(self, qpu_name, impl_language, impl_url, impl_data, bearer_token, input_params, profile=False):
         self.qpu_name = qpu_name
         self.impl_language = impl_language
         self.impl_url = impl_url
         self.impl_data = impl_data
         self.bearer_token = bearer_token
         self.input_params = input_params
+        self.profile = profile
 
 class ExecutionRequest:
-    def __init__(self, qpu_name, impl_language, impl_url, braket_ir, impl_data, bearer_token, shots, input_params):
+    def __init__(self, qpu_name, impl_language, impl_url, braket_ir, impl_data, bearer_token, shots, input_params,
+                 sweep=None, memo=False, noise_model=None, seed=None, profile=False):
         self.qpu_name = qpu_name
         self.impl_language = impl_language
         self.impl_url = impl_url
@@ -20,6 +22,20 @@ class ExecutionRequest:
         self.bearer_token = bearer_token
         self.shots = shots
         self.input_params = input_params
+        self.sweep = sweep
+        self.memo = memo
+        self.noise_model = noise_model
+        self.seed = seed
+        self.profile = profile
+
+
+class BatchExecutionRequest:
+    def __init__(self, qpu_name, bearer_token, shots, circuits, noise_model=None):
+        self.qpu_name = qpu_name
+        self.bearer_token = bearer_token
+        self.shots = shots
+        self.circuits = circuits
+        self.noise_model = noise_model
 
 
 class ResultRequest:
@@ -34,6 +50,7 @@ class TranspilationRequestSchema(ma.Schema):
     impl_data = ma.fields.String(data_key="impl-data")
     bearer_token = ma.fields.String(data_key="bearer-token")
     input_params = ma.fields.Mapping(data_key="input-params")
+    profile = ma.fields.Boolean()
 
 
 class ExecutionRequestSchema(ma.Schema):
@@ -45,6 +62,29 @@ class ExecutionRequestSchema(ma.Schema):
     bearer_token = ma.fields.String(data_key="bearer-token")
     shots = ma.fields.Integer()
     input_params = ma.fields.Mapping(data_key="input-params")
+    sweep = ma.fields.String(validate=ma.validate.OneOf(["grid", "zip"]))
+    memo = ma.fields.Boolean()
+    noise_model = ma.fields.Raw(data_key="noise-model")
+    seed = ma.fields.Integer(validate=ma.validate.Range(min=0))
+    profile = ma.fields.Boolean()
+
+
+class BatchCircuitSchema(ma.Schema):
+    qpu_name = ma.fields.String(data_key="qpu-name")
+    impl_language = ma.fields.String(data_key="impl-language")
+    impl_url = ma.fields.String(data_key="impl-url")
+    impl_data = ma.fields.String(data_key="impl-data")
+    braket_ir = ma.fields.String(data_key="braket-ir")
+    shots = ma.fields.Integer()
+    input_params = ma.fields.Mapping(data_key="input-params")
+
+
+class BatchExecutionRequestSchema(ma.Schema):
+    qpu_name = ma.fields.String(data_key="qpu-name")
+    bearer_token = ma.fields.String(data_key="bearer-token")
+    shots = ma.fields.Integer()
+    circuits = ma.fields.List(ma.fields.Nested(BatchCircuitSchema), required=True)
+    noise_model = ma.fields.Raw(data_key="noise-model")
 
 
 class ResultRequestSchema(ma.Schema):
@@ -1,10 +1,13 @@
+import json
+
 import marshmallow as ma
 from flask import Response
 
 
 class TranspilationResponse:
     def __init__(self, depth, multi_qubit_gate_depth, width, total_number_of_operations, number_of_single_qubit_gates,
-                 number_of_multi_qubit_gates, number_of_measurement_operations, transpiled_braket_ir):
+                 number_of_multi_qubit_gates, number_of_measurement_operations, transpiled_braket_ir,
+                 gate_counts_by_arity=None, gate_counts_by_type=None):
         self.depth = depth
         self.multi_qubit_gate_depth = multi_qubit_gate_depth
         self.width = width
@@ -13,32 +16,42 @@ class TranspilationResponse:
         self.number_of_multi_qubit_gates = number_of_multi_qubit_gates
         self.number_of_measurement_operations = number_of_measurement_operations
         self.transpiled_braket_ir = transpiled_braket_ir
+        self.gate_counts_by_arity = gate_counts_by_arity
+        self.gate_counts_by_type = gate_counts_by_type
 
 
 class ExecutionResponse(Response):
-    def __init__(self, location):
-        super().__init__()
+    def __init__(self, location, estimate=None):
+        super().__init__(mimetype="application/json")
         self.location = location
+        self.estimate = estimate
+        self.set_data(json.dumps(self.to_json()))
 
     def to_json(self):
         json_response = {'Location': self.location}
+        if self.estimate:
+            json_response['estimate'] = self.estimate
         return json_response
 
 
 class ResultResponse:
-    def __init__(self, id, complete, result=None, backend=None, shots=None):
+    def __init__(self, id, complete, result=None, backend=None, shots=None, timings=None):
         self.id = id
         self.complete = complete
         self.result = result
         self.backend = backend
         self.shots = shots
+        self.timings = timings
 
     def to_json(self):
         if self.result and self.backend and self.shots:
-            return {'id': self.id, 'complete': self.complete, 'result': self.result,
-                    'backend': self.backend, 'shots': self.shots}
+            json_response = {'id': self.id, 'complete': self.complete, 'result': self.result,
+                             'backend': self.backend, 'shots': self.shots}
         else:
-            return {'id': self.id, 'complete': self.complete}
+            json_response = {'id': self.id, 'complete': self.complete}
+        if self.timings:
+            json_response['timings'] = self.timings
+        return json_response
 
 
 class TranspilationResponseSchema(ma.Schema):
@@ -50,10 +63,15 @@ class TranspilationResponseSchema(ma.Schema):
     number_of_multi_qubit_gates = ma.fields.Integer(data_key="number-of-multi-qubit-gates")
     number_of_measurement_operations = ma.fields.Integer(data_key="number-of-measurement-operations")
     transpiled_braket_ir = ma.fields.String(data_key="transpiled-braket-ir")
+    gate_counts_by_arity = ma.fields.Mapping(data_key="gate-counts-by-arity")
+    gate_counts_by_type = ma.fields.Mapping(data_key="gate-counts-by-type")
+    # only set for profiled requests
+    profile_location = ma.fields.String(data_key="profile-location")
 
 
 class ExecutionResponseSchema(ma.Schema):
     location = ma.fields.String()
+    estimate = ma.fields.Mapping()
 
 
 class ResultResponseSchema(ma.Schema):
@@ -62,3 +80,4 @@ class ResultResponseSchema(ma.Schema):
     result = ma.fields.Mapping()
     backend = ma.fields.String()
     shots = ma.fields.Integer()
+    timings = ma.fields.Mapping()
@@ -0,0 +1,100 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import json
+import numbers
+import struct
+import zlib
+
+import numpy as np
+
+FORMAT_JSON = "json-zlib"
+FORMAT_HISTOGRAM = "histogram-v1"
+
+# width of the outcomes, item size of the outcome deltas, item size of the counts, number of outcomes
+_HISTOGRAM_HEADER = struct.Struct("<BBBI")
+
+_UNSIGNED_TYPES = (np.uint8, np.uint16, np.uint32, np.uint64)
+
+
+def encode(job_result):
+    """Return the storage format and the compressed binary representation of a job result.
+    Histograms are stored as sorted integer outcomes and their counts in packed arrays, everything else as JSON."""
+    if _is_histogram(job_result):
+        return FORMAT_HISTOGRAM, _encode_histogram(job_result)
+    return FORMAT_JSON, zlib.compress(json.dumps(job_result).encode("utf-8"))
+
+
+def decode(format, data):
+    """Return the job result stored with encode."""
+    if format == FORMAT_HISTOGRAM:
+        return _decode_histogram(data)
+    if format == FORMAT_JSON:
+        return json.loads(zlib.decompress(data).decode("utf-8"))
+    raise ValueError("Unknown result format: " + str(format))
+
+
+def _is_histogram(job_result):
+    if not isinstance(job_result, dict) or not job_result:
+        return False
+    width = len(next(iter(job_result)))
+    if not 0 < width <= 64:
+        return False
+    for outcome, count in job_result.items():
+        if not isinstance(outcome, str) or len(outcome) != width or outcome.strip("01"):
+            return False
+        if not isinstance(count, numbers.Integral) or isinstance(count, bool) or not 0 <= count < 2 ** 64:
+            return False
+    return True
+
+
+def _encode_histogram(histogram):
+    width = len(next(iter(histogram)))
+    outcomes = np.fromiter((int(outcome, 2) for outcome in histogram), dtype=np.uint64, count=len(histogram))
+    counts = np.fromiter((int(count) for count in histogram.values()), dtype=np.uint64, count=len(histogram))
+    order = np.argsort(outcomes)
+    # sorted outcomes are stored as differences, which are small for dense histograms and compress well
+    deltas = np.diff(outcomes[order], prepend=np.uint64(0))
+    deltas = deltas.astype(_smallest_type(deltas))
+    counts = counts[order].astype(_smallest_type(counts))
+    header = _HISTOGRAM_HEADER.pack(width, deltas.itemsize, counts.itemsize, len(histogram))
+    return zlib.compress(header + deltas.tobytes() + counts.tobytes())
+
+
+def _decode_histogram(data):
+    data = zlib.decompress(data)
+    width, delta_size, count_size, length = _HISTOGRAM_HEADER.unpack_from(data)
+    offset = _HISTOGRAM_HEADER.size
+    deltas = np.frombuffer(data, dtype=np.dtype(f"<u{delta_size}"), count=length, offset=offset)
+    counts = np.frombuffer(data, dtype=np.dtype(f"<u{count_size}"), count=length,
+                           offset=offset + length * delta_size)
+    outcomes = np.cumsum(deltas, dtype=np.uint64)
+    # all outcomes are turned into bit strings at once, most significant bit first
+    shifts = np.arange(width - 1, -1, -1, dtype=np.uint64)
+    bits = ((outcomes[:, None] >> shifts) & np.uint64(1)).astype(np.uint8) + ord("0")
+    bit_strings = np.ascontiguousarray(bits).view(f"S{width}").ravel()
+    return {outcome.decode("ascii"): count for outcome, count in zip(bit_strings, counts.tolist())}
+
+
+def _smallest_type(values):
+    maximum = int(values.max()) if len(values) else 0
+    for dtype in _UNSIGNED_TYPES:
+        if maximum <= np.iinfo(dtype).max:
+            return dtype
+    return np.uint64
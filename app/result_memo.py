@@ -0,0 +1,123 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import hashlib
+import json
+import time
+
+from app import app, circuit_cache
+
+# executions whose cost does not depend on a remote queue or pricing, only these are memoized
+MEMO_BACKENDS = frozenset(["local-simulator"])
+
+_KEY_PREFIX = "braket-service:memo:"
+_INDEX = "braket-service:memo-index"
+
+
+def request_key(impl_url, impl_data, impl_language, braket_ir, input_params, shots, qpu_name, noise_model,
+                bearer_token="", seed=None):
+    """Return the memo key of an execution request, which is known before its circuit is prepared."""
+    if braket_ir:
+        implementation = "ir:" + circuit_cache.ir_hash(braket_ir)
+    elif impl_data:
+        implementation = "data:" + hashlib.sha256(impl_data.encode("utf-8")).hexdigest()
+    else:
+        # implementations behind a url may be private, so only requests with the same token share results
+        token_hash = hashlib.sha256(bearer_token.encode("utf-8")).hexdigest()
+        implementation = "url:" + str(impl_url) + ":" + token_hash
+    return _key("request", implementation, (impl_language or "").lower(), dict(input_params or {}), shots,
+                qpu_name.lower(), noise_model, seed)
+
+
+def circuit_key(circuit, shots, qpu_name, noise_model, seed=None):
+    """Return the memo key of a prepared circuit, independent of the implementation it was prepared from."""
+    from braket.circuits.serialization import IRType
+    circuit_hash = circuit_cache.ir_dict_hash(json.loads(circuit.to_ir(ir_type=IRType.JAQCD).json()))
+    return _key("circuit", circuit_hash, shots, qpu_name.lower(), noise_model, seed)
+
+
+def claim(key, result_id):
+    """Register the result as the execution for the key and return None, or return the id of the result already
+    registered for it, which may still be in flight."""
+    name = _KEY_PREFIX + key
+    if app.redis.set(name, result_id, nx=True, ex=app.config['MEMO_TTL']):
+        _index(name)
+        return None
+    existing = app.redis.get(name)
+    if existing is None:
+        # the entry expired in between
+        return claim(key, result_id)
+    return existing.decode("utf-8")
+
+
+def replace(key, stale_id, result_id):
+    """Register the result for the key in place of the stale result and return True, or return False if another
+    result was registered for the key in the meantime."""
+    name = _KEY_PREFIX + key
+    replaced = []
+
+    def swap(pipe):
+        existing = pipe.get(name)
+        replaced[:] = [existing is None or existing.decode("utf-8") == stale_id]
+        pipe.multi()
+        if replaced[0]:
+            pipe.set(name, result_id, ex=app.config['MEMO_TTL'])
+
+    app.redis.transaction(swap, name)
+    if replaced[0]:
+        _index(name)
+    return replaced[0]
+
+
+def lookup(key):
+    """Return the id of the result registered for the key, or None."""
+    existing = app.redis.get(_KEY_PREFIX + key)
+    return existing.decode("utf-8") if existing is not None else None
+
+
+def remember(key, result_id):
+    """Register the finished result for the key."""
+    name = _KEY_PREFIX + key
+    app.redis.set(name, result_id, ex=app.config['MEMO_TTL'])
+    _index(name)
+
+
+def forget(key):
+    """Remove the key, for example after its execution failed."""
+    app.redis.delete(_KEY_PREFIX + key)
+    app.redis.zrem(_INDEX, _KEY_PREFIX + key)
+
+
+def _key(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _index(name):
+    """Record the key in the index ordered by time and evict the oldest keys beyond MEMO_MAX_ENTRIES."""
+    now = time.time()
+    pipeline = app.redis.pipeline()
+    pipeline.zadd(_INDEX, {name: now})
+    # entries that expired by their TTL are dropped from the index as well
+    pipeline.zremrangebyscore(_INDEX, 0, now - app.config['MEMO_TTL'])
+    pipeline.zcard(_INDEX)
+    size = pipeline.execute()[-1]
+    excess = size - app.config['MEMO_MAX_ENTRIES']
+    if excess > 0:
+        evicted = [entry for entry, _ in app.redis.zpopmin(_INDEX, excess)]
+        app.redis.delete(*evicted)
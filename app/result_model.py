@@ -17,15 +17,58 @@
 #  limitations under the License.
 # ******************************************************************************
 
-from app import db
+from sqlalchemy.orm import deferred
+
+from app import db, result_codec
 
 
 class Result(db.Model):
     id = db.Column(db.String(36), primary_key=True)
-    result = db.Column(db.String(1200), default="")
+    # the encoded result is only loaded when it is accessed, see result_codec for the formats
+    result_data = deferred(db.Column(db.LargeBinary))
+    result_format = db.Column(db.String(32))
     backend = db.Column(db.String(1200), default="")
     shots = db.Column(db.Integer, default=0)
     complete = db.Column(db.Boolean, default=False)
+    # set for the results of the circuits of a batch execution
+    parent_id = db.Column(db.String(36), index=True)
+    # set for executions on QPUs, which are finished by the remote tracker
+    task_arn = db.Column(db.String(256), index=True)
+    submitted_at = db.Column(db.DateTime)
+    # set for memoized executions, the result with this id holds the payload
+    alias_of = db.Column(db.String(36))
+    # JSON object of the durations of the stages of the execution job in seconds, see metrics
+    timings = db.Column(db.Text)
+    # JSON object of the estimated cost of the execution job, which is fitted to the timings, see cost_model
+    estimate = db.Column(db.Text)
+
+    @property
+    def result(self):
+        """Decode the stored result, None until a result is stored."""
+        if self.result_data is None:
+            return None
+        return result_codec.decode(self.result_format, self.result_data)
+
+    @result.setter
+    def result(self, job_result):
+        self.result_format, self.result_data = result_codec.encode(job_result)
+
+    @staticmethod
+    def encoded(job_result):
+        """Return the columns that store the job result, see the result property."""
+        result_format, result_data = result_codec.encode(job_result)
+        return {'result_format': result_format, 'result_data': result_data}
+
+    @staticmethod
+    def update_unfinished(result_id, **values):
+        """Update the columns of the result unless it is complete and return whether it was updated. The single
+        conditional UPDATE keeps a job and the cancellation of its execution from overwriting each other's result."""
+        return Result.query.filter_by(id=result_id, complete=False).update(values, synchronize_session=False) > 0
+
+    @staticmethod
+    def finalize(result_id, job_result, **values):
+        """Store the job result and complete the result unless it is complete already, see update_unfinished."""
+        return Result.update_unfinished(result_id, complete=True, **Result.encoded(job_result), **values)
 
     def __repr__(self):
-        return 'Result {}'.format(self.result)
+        return 'Result {}'.format(self.id)
@@ -0,0 +1,103 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import os
+import threading
+import time
+
+from app import app
+
+CHANNEL = "braket-service:results"
+
+_lock = threading.Lock()
+_waiters = {}
+_listener = None
+_listener_pid = None
+
+
+def publish(result_id):
+    """Notify all processes that the result is complete."""
+    try:
+        app.redis.publish(CHANNEL, result_id)
+    except Exception as e:
+        app.logger.warning("Could not publish completion of result " + result_id + ": " + str(e))
+
+
+def wait(result_id, timeout, is_complete):
+    """Block until is_complete returns True or the timeout expires and return its last value.
+    is_complete is called once the waiter is registered, so a completion right before cannot be missed, and again
+    whenever a completion of the result is published. All waiters of a process share a single subscription."""
+    deadline = time.monotonic() + timeout
+    _ensure_listener()
+    event = threading.Event()
+    with _lock:
+        _waiters.setdefault(result_id, set()).add(event)
+    try:
+        while True:
+            if is_complete():
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not event.wait(remaining):
+                return False
+            event.clear()
+    finally:
+        with _lock:
+            events = _waiters[result_id]
+            events.discard(event)
+            if not events:
+                del _waiters[result_id]
+
+
+def _ensure_listener():
+    global _listener, _listener_pid
+    with _lock:
+        # a listener thread does not survive a fork, so every process starts its own
+        if _listener is None or _listener_pid != os.getpid() or not _listener.is_alive():
+            _listener = threading.Thread(target=_listen, name="result-notifications", daemon=True)
+            _listener_pid = os.getpid()
+            _listener.start()
+
+
+def _listen():
+    while True:
+        try:
+            pubsub = app.redis.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(CHANNEL)
+            # completions may have been missed while (re)connecting, so all waiters check their result again
+            _wake_all()
+            for message in pubsub.listen():
+                if message["type"] == "message":
+                    _wake(message["data"].decode("utf-8"))
+        except Exception as e:
+            app.logger.warning("Subscription to result notifications failed: " + str(e))
+            _wake_all()
+            time.sleep(1)
+
+
+def _wake(result_id):
+    with _lock:
+        for event in _waiters.get(result_id, ()):
+            event.set()
+
+
+def _wake_all():
+    with _lock:
+        for events in _waiters.values():
+            for event in events:
+                event.set()
@@ -16,20 +16,26 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 # ******************************************************************************
-import braket.circuits
-
-from app import app, braket_handler, implementation_handler, db, parameters
+# implementation_handler imports the Braket SDK, so it is only imported by the endpoint that builds circuits to keep
+# the startup of the web workers fast
+from app import admission, app, cancellation, circuit_analyzer, cost_model, db, device_catalog, metrics, \
+    noise_models, parameters, profiling, result_memo, result_notifications, sampling
 from app.request_schemas import ExecutionRequestSchema, ExecutionRequest, TranspilationRequestSchema, \
-    TranspilationRequest
+    TranspilationRequest, BatchExecutionRequestSchema, BatchExecutionRequest
 from app.response_schemas import ExecutionResponseSchema, ExecutionResponse, ResultResponseSchema, ResultResponse, \
     TranspilationResponseSchema, TranspilationResponse
+from app.profile_model import Profile
 from app.result_model import Result
-from flask import jsonify, abort, request, Response
+from flask import jsonify, abort, request, Response, stream_with_context
 import logging
 import json
 from flask_smorest import Blueprint
+from werkzeug.exceptions import TooManyRequests
 import base64
+import hmac
+import time
 import traceback
+import uuid
 
 
 blp = Blueprint(
@@ -51,7 +57,25 @@ blp = Blueprint(
 @blp.response(200, TranspilationResponseSchema)
 def transpile_circuit(json: TranspilationRequest):
     """Get implementation from URL. Pass input into implementation. Generate and transpile circuit
-    and return depth and width."""
+    and return depth and width. With "profile": true, the request is profiled and the location of the profile is
+    returned, which requires the X-Admin-Token header."""
+    if not json or not json.get('profile'):
+        return _transpile(json)
+    _require_admin()
+    # allocations are not traced, tracemalloc would slow down every request that runs in the same process meanwhile
+    profiling.start(True)
+    try:
+        with profiling.section():
+            response = _transpile(json)
+    finally:
+        profile = profiling.finish()
+    if isinstance(response, TranspilationResponse):
+        response.profile_location = _store_profile(profile)
+    return response
+
+
+def _transpile(json):
+    from app import implementation_handler
     if not json:
         abort(400)
     qpu_name = json.get('qpu_name', "")
@@ -72,10 +96,12 @@ def transpile_circuit(json: TranspilationRequest):
     # else:
     #     abort(400)
 
+    circuit = None
+    braket_ir = None
     if impl_url:
         if impl_language.lower() == 'braket-ir':
             short_impl_name = 'no name'
-            circuit = implementation_handler.prepare_code_from_braket_ir_url(impl_url, bearer_token)
+            braket_ir = implementation_handler.get_implementation_from_url(impl_url, bearer_token)
         else:
             short_impl_name = "untitled"
             try:
@@ -90,7 +116,7 @@ def transpile_circuit(json: TranspilationRequest):
 
         short_impl_name = 'no short name'
         if impl_language.lower() == 'braket-ir':
-            circuit = implementation_handler.prepare_code_from_braket_ir(impl_data)
+            braket_ir = impl_data
         else:
             try:
                 circuit = implementation_handler.prepare_code_from_data(impl_data, input_params)
@@ -99,7 +125,13 @@ def transpile_circuit(json: TranspilationRequest):
     else:
         abort(400)
 
-
+    metrics = None
+    if braket_ir is not None:
+        # the IR is validated before it is echoed as the transpiled IR, so invalid IR is rejected like before
+        try:
+            metrics = circuit_analyzer.analyze_braket_ir(braket_ir)
+        except ValueError:
+            abort(400)
 
     try:
         # transpile circuit (currently only local sim is supported, so no transpilation is done)
@@ -108,33 +140,30 @@ def transpile_circuit(json: TranspilationRequest):
             # TODO: Do actual transpilation if ever possible
             pass
 
-        # count number of gates and multi qubit gates by iterating over all operations
-        number_of_multi_qubit_gates = 0
-
-        total_number_of_gates = 0
-        for instruction in circuit.instructions:
-            if issubclass(type(instruction.operator), braket.circuits.gate.Gate):
-                total_number_of_gates += 1
-                if len(instruction.target) > 1:
-                    number_of_multi_qubit_gates += 1
+        # all metrics are computed in one pass over the IR, Braket-IR inputs are analyzed without building a circuit
+        if braket_ir is not None:
+            transpiled_braket_ir = _indent_braket_ir(braket_ir)
+        else:
+            metrics = circuit_analyzer.analyze_circuit(circuit)
+            transpiled_braket_ir = circuit.to_ir().json(indent=4)
 
         # width: the amount of qubits
-        width = len(circuit.qubits)
+        width = metrics.width
 
         # gate_depth: the longest subsequence of compiled instructions where adjacent instructions share resources
-        depth = circuit.depth
+        depth = metrics.depth
 
-        # multi_qubit_gate_depth not available in braket
-        multi_qubit_gate_depth = -1
+        # multi_qubit_gate_depth: the gate depth when only counting multi qubit gates
+        multi_qubit_gate_depth = metrics.multi_qubit_gate_depth
 
-        # count number of single qubit gates
-        number_of_single_qubit_gates = total_number_of_gates - number_of_multi_qubit_gates
+        number_of_single_qubit_gates = metrics.number_of_single_qubit_gates
+        number_of_multi_qubit_gates = metrics.number_of_multi_qubit_gates
 
         # in braket measurement operations are saved separately from gates as result types
-        number_of_measurement_operations = len(circuit.result_types)
+        number_of_measurement_operations = metrics.number_of_measurement_operations
 
         # count total number of all operations including gates and measurement operations
-        total_number_of_operations = total_number_of_gates + number_of_measurement_operations
+        total_number_of_operations = metrics.total_number_of_operations
     except NotImplementedError:
         app.logger.info(f"QPU {qpu_name} is not supported!")
         abort(400)
@@ -143,6 +172,9 @@ def transpile_circuit(json: TranspilationRequest):
         app.logger.info(traceback.format_exc())
         return jsonify({'error': 'transpilation failed'}), 200
 
+    if qpu_name and qpu_name.lower() != "local-simulator":
+        _check_device(qpu_name, metrics.qubit_count)
+
     app.logger.info(f"Transpile {short_impl_name} for {qpu_name}: "
                     f"w={width}, "
                     f"d={depth}, "
@@ -153,12 +185,30 @@ def transpile_circuit(json: TranspilationRequest):
                     f"multi qubit gate depth={multi_qubit_gate_depth}")
 
     return TranspilationResponse(depth, multi_qubit_gate_depth, width, total_number_of_operations,
-                                number_of_single_qubit_gates, number_of_multi_qubit_gates,
-                                number_of_measurement_operations, circuit.to_ir().json(indent=4))
+                                 number_of_single_qubit_gates, number_of_multi_qubit_gates,
+                                 number_of_measurement_operations, transpiled_braket_ir,
+                                 {str(arity): count for arity, count in metrics.gate_counts_by_arity.items()},
+                                 metrics.gate_counts_by_type)
 
 
+def _indent_braket_ir(braket_ir):
+    return json.dumps(json.loads(braket_ir), indent=4)
 
 
+def _require_admin():
+    """Abort unless the request sends the admin token, which is required for profiling."""
+    token = app.config['PROFILE_ADMIN_TOKEN']
+    if not token or not hmac.compare_digest(request.headers.get('X-Admin-Token', '').encode(), token.encode()):
+        abort(401)
+
+
+def _store_profile(profile):
+    """Store the profile of a request that has no result of its own and return its location."""
+    stored = Profile(id=str(uuid.uuid4()), stats=profile.stats(), report=profile.report())
+    db.session.add(stored)
+    db.session.commit()
+    return '/braket-service/api/v1.0/profiles/' + stored.id
+
 
 @blp.route("/execute", methods=["POST"])
 @blp.arguments(
@@ -191,6 +241,14 @@ def execute_circuit(json: ExecutionRequest):
     if input_params != "":
         input_params = parameters.ParameterDictionary(input_params)
     shots = json.get('shots', 1024)
+    sweep = json.get('sweep')
+    noise_model = _parse_noise_model(json.get('noise_model'))
+    seed = json.get('seed')
+    profile = bool(json.get('profile'))
+    if profile:
+        _require_admin()
+    request_ir = _request_ir(braket_ir, impl_data, impl_language)
+    _check_circuit(qpu_name, request_ir, noise_model)
     if 'token' in input_params:
         token = input_params['token']
         input_params = {}
@@ -201,16 +259,225 @@ def execute_circuit(json: ExecutionRequest):
 
     app.logger.info(f"ir {braket_ir}")
 
-    job = app.execute_queue.enqueue('app.tasks.execute', impl_url=impl_url, impl_data=impl_data,
-                                    impl_language=impl_language, braket_ir=braket_ir, qpu_name=qpu_name,
-                                    token=token, input_params=input_params, shots=shots, bearer_token=bearer_token)
-    result = Result(id=job.get_id(), backend=qpu_name, shots=shots)
+    tenant = admission.tenant_of(bearer_token, token, request.remote_addr)
+    estimate = cost_model.Estimate()
+    job_id = str(uuid.uuid4())
+    alias_of = None
+    if sweep:
+        # a sweep binds every parameter set to the same circuit, which is prepared only once by a single job
+        if not input_params:
+            abort(400)
+        if braket_ir or impl_language.lower() == 'braket-ir':
+            # JAQCD Braket-IR has no free parameters, every parameter set would execute the same circuit
+            abort(400, "Sweeps require a Python implementation, Braket-IR has no free parameters.")
+        try:
+            points = input_params.sweep_points(sweep)
+        except ValueError:
+            abort(400)
+        _add_to_estimate(estimate, qpu_name, request_ir, noise_model, shots, len(points))
+        job = _enqueue(estimate, tenant, 'app.tasks.execute_sweep', impl_url=impl_url, impl_data=impl_data,
+                       impl_language=impl_language, braket_ir=braket_ir, qpu_name=qpu_name, input_params=input_params,
+                       sweep=sweep, shots=shots, bearer_token=bearer_token, noise_model=noise_model, profile=profile)
+    else:
+        memo_key = None
+        # profiled requests are always executed, a memoized result would not tell where the time is spent
+        if json.get('memo') and not profile and qpu_name.lower() in result_memo.MEMO_BACKENDS:
+            # identical requests share the result of the first one, whether it is finished or still in flight
+            memo_key = result_memo.request_key(impl_url, impl_data, impl_language, braket_ir, input_params, shots,
+                                               qpu_name, noise_model.name, bearer_token, seed)
+            # the result is committed before it is claimed, so every claimed result can be found by the others
+            db.session.add(Result(id=job_id, backend=qpu_name, shots=shots))
+            db.session.commit()
+            alias_of = _claim(memo_key, job_id)
+        if alias_of:
+            app.logger.info(f"Memoized result {alias_of} is used for {job_id}")
+            job = None
+        else:
+            _add_to_estimate(estimate, qpu_name, request_ir, noise_model, shots)
+            job = _enqueue(estimate, tenant, 'app.tasks.execute', impl_url=impl_url, impl_data=impl_data,
+                           impl_language=impl_language, braket_ir=braket_ir, qpu_name=qpu_name, token=token,
+                           input_params=input_params, shots=shots, bearer_token=bearer_token, memo_key=memo_key,
+                           noise_model=noise_model, seed=seed, profile=profile, job_id=job_id)
+    estimate = estimate.to_json() if job else None
+    result = Result(id=job.get_id() if job else job_id, backend=qpu_name, shots=shots, alias_of=alias_of,
+                    estimate=_encode_estimate(estimate))
+    # the result of a memoized request is already stored
+    result = db.session.merge(result)
+    db.session.commit()
+
+    logging.info('Returning HTTP response to client...')
+    content_location = '/braket-service/api/v1.0/results/' + result.id
+    response = ExecutionResponse(content_location, estimate)
+    response.status_code = 202
+    response.headers.set('Location', content_location)
+    return response
+
+
+def _parse_noise_model(spec):
+    try:
+        return noise_models.parse(spec)
+    except ValueError as e:
+        abort(400, str(e))
+
+
+def _request_ir(braket_ir, impl_data, impl_language):
+    """Return the Braket-IR sent with a request, None for implementations and URLs, which only the job prepares."""
+    if braket_ir:
+        return braket_ir
+    if impl_data and (impl_language or '').lower() == 'braket-ir':
+        try:
+            return base64.b64decode(impl_data.encode()).decode()
+        except ValueError:
+            # invalid data is reported by the execution job like before
+            return None
+    return None
+
+
+def _add_to_estimate(estimate, qpu_name, braket_ir, noise_model, shots, circuits=1):
+    """Add the circuits of an execution to the estimated cost of its job. The size of circuits of implementations is
+    not known before the job prepares them."""
+    if qpu_name.lower() != 'local-simulator':
+        estimate.add_remote()
+        return
+    try:
+        metrics = circuit_analyzer.analyze_braket_ir(braket_ir) if braket_ir else None
+    except Exception:
+        metrics = None
+    if metrics is None:
+        estimate.add_unknown()
+        return
+    # like braket_handler.select_simulator, noise requires the density matrix simulator
+    engine = "sv" if noise_model.is_noiseless and not metrics.number_of_noise_operations else "dm"
+    estimate.add(engine, metrics.qubit_count, metrics.total_number_of_gates, shots, circuits)
+
+
+def _enqueue(estimate, tenant, function, **kwargs):
+    """Admit the job of the tenant and put it in the queue of the tier of its estimated cost. Over the limits of the
+    admission control, the request is rejected with 429 and a rejected job releases the claim of its memoized
+    result."""
+    job_id = kwargs.pop('job_id', None) or str(uuid.uuid4())
+    try:
+        cost = admission.admit(tenant, request.remote_addr, estimate)
+    except TooManyRequests as e:
+        if kwargs.get('memo_key'):
+            _reject_claim(kwargs['memo_key'], job_id, e.description)
+        raise
+    # the work is tracked before the job is queued, so a worker cannot finish it before it is counted
+    admission.track(job_id, cost)
+    try:
+        return app.execute_queues[estimate.tier].enqueue(function, job_id=job_id, **kwargs)
+    except Exception:
+        admission.finished(job_id)
+        raise
+
+
+def _reject_claim(memo_key, result_id, message):
+    """Release the claim of a rejected request and complete its result, which was committed before the claim and may
+    already be shared by identical requests, with the error."""
+    result_memo.forget(memo_key)
+    result = Result.query.get(result_id)
+    if result:
+        result.result = {'error': 'rejected: ' + message}
+        result.complete = True
+        db.session.commit()
+        result_notifications.publish(result_id)
+
+
+def _encode_estimate(estimate):
+    return json.dumps(estimate) if estimate else None
+
+
+
+def _check_circuit(qpu_name, braket_ir, noise_model):
+    """Reject circuits that cannot run before they are queued: local simulations that need too much memory and
+    remote executions on devices that cannot run them. Without Braket-IR only the device is checked."""
+    qubit_count = _qubit_count_of(braket_ir) if braket_ir else None
+    if qpu_name.lower() != 'local-simulator':
+        _check_device(qpu_name, qubit_count or 0)
+    elif qubit_count is not None:
+        try:
+            sampling.check_memory(qubit_count, not noise_model.is_noiseless)
+        except ValueError as e:
+            abort(400, str(e))
+
+
+def _qubit_count_of(braket_ir):
+    try:
+        # like the checks of the job, the qubits up to the highest index are counted
+        return circuit_analyzer.analyze_braket_ir(braket_ir).qubit_count
+    except Exception:
+        # invalid Braket-IR is reported by the execution job like before
+        return None
+
+
+def _check_device(qpu_name, width):
+    """Reject requests for devices that do not exist, accept no quantum tasks or have fewer qubits than the circuit."""
+    try:
+        device_catalog.validate(qpu_name, width)
+    except ValueError as e:
+        abort(400, str(e))
+    except Exception as e:
+        # without the catalog the device is checked by the Braket API like before
+        app.logger.warning(f"The device catalog is not available: {e}")
+
+
+@blp.route("/execute-batch", methods=["POST"])
+@blp.arguments(
+    BatchExecutionRequestSchema,
+    example={
+        "qpu-name": "local-simulator",
+        "shots": 1024,
+        "circuits": [
+            {
+                "impl-url": "https://raw.githubusercontent.com/UST-QuAntiL/braket-service/main/Sample%20Implementations/circuit_braket.py",
+                "impl-language": "Braket",
+                "input-params": {"param1": {"rawValue": "2", "type": "Integer"}}
+            },
+            {
+                "impl-url": "https://raw.githubusercontent.com/UST-QuAntiL/braket-service/main/Sample%20Implementations/circuit_braket_ir.json",
+                "impl-language": "Braket-IR"
+            }
+        ]
+    }
+)
+@blp.response(202, ExecutionResponseSchema)
+def execute_batch(json: BatchExecutionRequest):
+    """Put one execution job for a batch of circuits in queue. Return location of the later result, which lists the
+    locations of the results of the single circuits."""
+    if not json or not json.get('circuits'):
+        abort(400)
+    qpu_name = json.get('qpu_name', 'local-simulator')
+    bearer_token = json.get("bearer_token", "")
+    shots = json.get('shots', 1024)
+    noise_model = _parse_noise_model(json.get('noise_model'))
+
+    circuits = []
+    estimate = cost_model.Estimate()
+    for circuit in json.get('circuits'):
+        circuit = dict(circuit, result_id=str(uuid.uuid4()))
+        if circuit.get('input_params'):
+            circuit['input_params'] = parameters.ParameterDictionary(circuit['input_params'])
+        circuits.append(circuit)
+        circuit_qpu_name = circuit.get('qpu_name') or qpu_name
+        request_ir = _request_ir(circuit.get('braket_ir'), circuit.get('impl_data'), circuit.get('impl_language'))
+        # like /execute, circuits that cannot run are rejected before the batch is queued
+        _check_circuit(circuit_qpu_name, request_ir, noise_model)
+        _add_to_estimate(estimate, circuit_qpu_name, request_ir, noise_model, circuit.get('shots') or shots)
+
+    job = _enqueue(estimate, admission.tenant_of(bearer_token, None, request.remote_addr), 'app.tasks.execute_batch',
+                   circuits=circuits, qpu_name=qpu_name, shots=shots, bearer_token=bearer_token,
+                   noise_model=noise_model)
+    estimate = estimate.to_json()
+    result = Result(id=job.get_id(), backend=qpu_name, shots=shots, estimate=_encode_estimate(estimate))
     db.session.add(result)
+    for circuit in circuits:
+        db.session.add(Result(id=circuit['result_id'], backend=circuit.get('qpu_name', qpu_name),
+                              shots=circuit.get('shots', shots), parent_id=result.id))
     db.session.commit()
 
     logging.info('Returning HTTP response to client...')
     content_location = '/braket-service/api/v1.0/results/' + result.id
-    response = ExecutionResponse(content_location)
+    response = ExecutionResponse(content_location, estimate)
     response.status_code = 202
     response.headers.set('Location', content_location)
     return response
@@ -222,17 +489,132 @@ def calculate_calibration_matrix():
     abort(404)
 
 
+@app.route('/metrics', methods=['GET'])
+def export_metrics():
+    """Return the stage histograms of all processes, the queue depth and the worker utilization for Prometheus."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
 @blp.route("/results/<string:result_id>", methods=["GET"])
 @blp.response(200, ResultResponseSchema)
 def get_result(result_id):
-    """Return result when it is available."""
+    """Return result when it is available. With ?wait=SECONDS, wait up to that long for the result to complete."""
     result = Result.query.get(str(result_id).strip())
-    if result.complete:
-        result_histogram = json.loads(result.result)
-        response = ResultResponse(result.id, result.complete, result_histogram, result.backend, result.shots)
-    else:
-        response = ResultResponse(result.id, result.complete)
-    return response
+    if not result:
+        abort(404)
+    source = _source_of(result)
+    timeout = min(request.args.get('wait', 0, type=float), app.config['RESULT_MAX_WAIT'])
+    if not source.complete and timeout > 0:
+        source = _wait_for(result, source, timeout)
+    return _result_response(result, source)
+
+
+@blp.route("/results/<string:result_id>", methods=["DELETE"])
+@blp.response(200, ResultResponseSchema)
+def cancel_result(result_id):
+    """Cancel the execution of the result and return the result, which is finalized with the state the execution was
+    in. A queued job is removed from its queue, a running local simulation is stopped, and the quantum task of an
+    execution on a QPU is canceled. Results that are already complete are returned unchanged."""
+    result = Result.query.get(str(result_id).strip())
+    if not result:
+        abort(404)
+    if result.parent_id:
+        abort(400, "The results of a batch are canceled with the batch.")
+    # the job of a batch completes after submitting its quantum tasks, which may still be canceled
+    if not result.complete or Result.query.filter_by(parent_id=result.id, complete=False).count():
+        cancellation.cancel(result)
+    return _result_response(result, _source_of(result))
+
+
+@blp.route("/results/<string:result_id>/stream", methods=["GET"])
+def stream_result(result_id):
+    """Stream the result as a server-sent event as soon as it is available."""
+    result = Result.query.get(str(result_id).strip())
+    if not result:
+        abort(404)
+
+    def events():
+        # comments keep the connection open while the result is not complete
+        source = _wait_for(result, _source_of(result), app.config['RESULT_STREAM_HEARTBEAT'])
+        while not source.complete:
+            yield ": keep-alive\n\n"
+            source = _wait_for(result, source, app.config['RESULT_STREAM_HEARTBEAT'])
+        yield "event: result\ndata: " + json.dumps(_result_response(result, source).to_json()) + "\n\n"
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def _claim(memo_key, result_id):
+    """Claim the execution for the memo key and return None, or return the id of the result that claimed it before."""
+    while True:
+        alias_of = result_memo.claim(memo_key, result_id)
+        # results are committed before they are claimed, so a claimed result without a row was deleted since
+        if not alias_of or Result.query.get(alias_of):
+            return alias_of
+        if result_memo.replace(memo_key, alias_of, result_id):
+            return None
+
+
+@blp.route("/profiles/<string:profile_id>", methods=["GET"])
+def get_profile(profile_id):
+    """Return the text report of the profile of a profiled request, which has the id of the result of executions.
+    With ?format=pstats, return its statistics in the format of pstats instead. Requires the X-Admin-Token header."""
+    _require_admin()
+    profile = Profile.query.get(str(profile_id).strip())
+    if not profile:
+        abort(404)
+    if request.args.get('format') == 'pstats':
+        return Response(profile.stats, mimetype="application/octet-stream",
+                        headers={"Content-Disposition": f"attachment; filename={profile.id}.prof"})
+    return Response(profile.report, mimetype="text/plain")
+
+
+def _source_of(result):
+    """Return the result that holds the payload, which differs for memoized results."""
+    while result.alias_of:
+        source = Result.query.get(result.alias_of)
+        if not source:
+            break
+        result = source
+    return result
+
+
+def _wait_for(result, source, timeout):
+    """Wait up to timeout seconds for the source of the result to complete and return the source. A memoized result
+    gets another source when the execution it shares is canceled and handed over, see cancellation.cancel."""
+    deadline = time.monotonic() + timeout
+    while not source.complete:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not result_notifications.wait(source.id, remaining, lambda: _reload(source).complete):
+            break
+        source = _source_of(_reload(result))
+    return source
+
+
+def _reload(result):
+    db.session.refresh(result)
+    return result
+
+
+def _result_response(result, source):
+    timings = json.loads(result.timings) if result.timings else None
+    if source.complete:
+        return ResultResponse(result.id, source.complete, source.result, result.backend, result.shots, timings)
+    return ResultResponse(result.id, source.complete, timings=timings)
+
+
+@blp.route("/devices", methods=["GET"])
+@blp.response(200)
+def list_devices():
+    """Return the remote devices with their status, qubit count, native gates, supported operations and result
+    types."""
+    try:
+        devices = device_catalog.devices()
+    except Exception:
+        app.logger.info(traceback.format_exc())
+        return jsonify({'error': 'device catalog not available'}), 503
+    return jsonify({'devices': sorted(devices.values(), key=lambda device: device['arn'])})
 
 
 @blp.route("/version", methods=["GET"])
@@ -0,0 +1,247 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import json
+import multiprocessing
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from app import app, circuit_cache, profiling
+from app.lru_cache import LRUCache
+
+_distributions = LRUCache(app.config['DISTRIBUTION_CACHE_SIZE'], app.config['DISTRIBUTION_CACHE_MAX_BYTES'],
+                          sizeof=lambda probabilities: probabilities.nbytes)
+
+_simulators = {}
+
+
+def local_simulator(name):
+    """Return the local simulator of that name, which is created only once per process."""
+    simulator = _simulators.get(name)
+    if simulator is None:
+        from braket.devices import LocalSimulator
+        simulator = _simulators.setdefault(name, LocalSimulator(name))
+    return simulator
+
+
+def required_memory(qubit_count, density_matrix):
+    """Return the bytes the simulation of that many qubits needs. A state vector holds 2^n and a density matrix 4^n
+    complex amplitudes, and the simulators keep a second copy."""
+    amplitudes = 4 ** qubit_count if density_matrix else 2 ** qubit_count
+    return 2 * 16 * amplitudes
+
+
+def check_memory(qubit_count, density_matrix):
+    """Raise a ValueError if the simulation of that many qubits needs more than LOCAL_SIMULATION_MAX_MEMORY bytes."""
+    required = required_memory(qubit_count, density_matrix)
+    if required > app.config['LOCAL_SIMULATION_MAX_MEMORY']:
+        simulation = "density matrix" if density_matrix else "state vector"
+        raise ValueError(f"The {simulation} simulation of {qubit_count} qubits needs about {_format_bytes(required)}, "
+                         f"which exceeds the limit of {_format_bytes(app.config['LOCAL_SIMULATION_MAX_MEMORY'])}."
+                         + (" Simulate without noise to use the state vector simulator." if density_matrix else ""))
+
+
+def measurement_counts(simulator, circuit, shots, seed=None, run=None):
+    """Simulate the circuit with the local simulator of that name and return its measurement counts.
+    Circuits that measure all their qubits are simulated once without shots, and all shots are sampled from the
+    resulting, cached distribution with an RNG stream derived from seed. Other circuits with many shots are split
+    into shards that are simulated in parallel processes, which cannot be seeded, see check_seed. The simulations
+    are called with run(function, *args) if given, e.g. run_in_child, while cached distributions are sampled in the
+    calling process."""
+    check_seed(circuit, seed)
+    run = run or _call
+    if _measures_all_qubits(circuit):
+        return sample(distribution(simulator, circuit, run), len(circuit.qubits), shots, seed)
+    shard_count = min(app.config['SIMULATION_PROCESSES'], shots // app.config['SHARD_MIN_SHOTS'])
+    if shard_count > 1:
+        return run(_simulate_sharded, simulator, circuit, shots, shard_count)
+    return run(_run_shard, simulator, circuit, shots)
+
+
+def check_seed(circuit, seed):
+    """Raise a ValueError if the circuit has a seed but its shots cannot be drawn from it. The Braket simulators draw
+    the shots of circuits with result types or measure instructions from fresh OS entropy."""
+    if seed is not None and not _measures_all_qubits(circuit):
+        raise ValueError("A seed is only supported for circuits that measure all their qubits, without result types "
+                         "or measure instructions.")
+
+
+def distribution(simulator, circuit, run=None):
+    """Return the probabilities of all basis states of the qubits of the circuit, most significant qubit first."""
+    key = _distribution_key(simulator, circuit)
+    probabilities = _distributions.get(key) if key else None
+    if probabilities is None:
+        probabilities = (run or _call)(_probabilities, simulator, circuit)
+        probabilities.flags.writeable = False
+        if key:
+            _distributions.put(key, probabilities)
+    return probabilities
+
+
+def sample(probabilities, qubit_count, shots, seed=None):
+    """Draw shots from the distribution and return the counts of the drawn basis states as bit strings.
+    All shots are drawn with a single multinomial draw, which costs the same for any number of shots."""
+    rng = np.random.default_rng(np.random.SeedSequence(seed))
+    counts = rng.multinomial(shots, probabilities)
+    states = np.flatnonzero(counts)
+    return dict(zip(_bit_strings(states, qubit_count), counts[states].tolist()))
+
+
+def merge_counts(shard_counts):
+    """Add up the counts of several shards with a single vectorized reduction."""
+    outcomes = np.array([outcome for counts in shard_counts for outcome in counts])
+    if not len(outcomes):
+        return {}
+    values = np.fromiter((count for counts in shard_counts for count in counts.values()), dtype=np.int64,
+                         count=len(outcomes))
+    unique, inverse = np.unique(outcomes, return_inverse=True)
+    totals = np.bincount(inverse.ravel(), weights=values).astype(np.int64)
+    return dict(zip(unique.tolist(), totals.tolist()))
+
+
+def _distribution_key(simulator, circuit):
+    from braket.circuits.serialization import IRType
+    try:
+        ir = json.loads(circuit.to_ir(ir_type=IRType.JAQCD).json())
+    except Exception:
+        # circuits without a JAQCD representation are not cached
+        return None
+    return simulator + ":" + circuit_cache.ir_dict_hash(ir)
+
+
+def _measures_all_qubits(circuit):
+    # result types and explicit measurements change which qubits are measured and in which basis
+    return bool(circuit.qubits) and not circuit.result_types and not any(
+        type(instruction.operator).__name__ == "Measure" for instruction in circuit.instructions)
+
+
+def _bit_strings(states, qubit_count):
+    shifts = np.arange(qubit_count - 1, -1, -1, dtype=np.int64)
+    bits = ((states[:, None] >> shifts) & 1).astype(np.uint8) + ord("0")
+    return [bit_string.decode("ascii") for bit_string in np.ascontiguousarray(bits).view(f"S{qubit_count}").ravel()]
+
+
+def run_in_child(function, *args, timeout=None, check=None):
+    """Call the function in a child process and return its result. The child and the processes it started are killed
+    after timeout seconds, which raises a TimeoutError, so a simulation does not keep running in a worker that
+    executes its jobs in its own process. While the child runs, check is called every CANCEL_POLL_INTERVAL seconds
+    and kills the child if it raises, e.g. when the job is canceled. Exceptions of the function are raised again. In
+    a profiled context, the call is profiled in the child and its statistics are added to the profile."""
+    # forked processes start without importing braket again, which takes seconds
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_call_in_child, args=(sender, function, args))
+    process.start()
+    sender.close()
+    deadline = time.monotonic() + timeout if timeout else None
+    try:
+        while not receiver.poll(_poll_timeout(deadline, check)):
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError()
+            if check:
+                check()
+        try:
+            succeeded, value, stats = receiver.recv()
+        except EOFError:
+            raise RuntimeError("The simulation process exited without a result.")
+    finally:
+        _kill(process)
+        receiver.close()
+    profiling.add(stats)
+    if not succeeded:
+        raise value
+    return value
+
+
+def _poll_timeout(deadline, check):
+    remaining = max(deadline - time.monotonic(), 0) if deadline is not None else None
+    if check is None:
+        return remaining
+    interval = app.config['CANCEL_POLL_INTERVAL']
+    return interval if remaining is None else min(remaining, interval)
+
+
+def _call(function, *args):
+    return function(*args)
+
+
+def _call_in_child(sender, function, args):
+    if hasattr(os, "setpgrp"):
+        # the child leads its own process group, so the processes it starts are killed with it
+        os.setpgrp()
+    try:
+        outcome = (True,) + profiling.call_in_child(function, *args)
+    except Exception as e:
+        outcome = (False, e, None)
+    try:
+        sender.send(outcome)
+    except Exception as e:
+        # results and exceptions that cannot be pickled
+        sender.send((False, RuntimeError(str(e)), None))
+    finally:
+        sender.close()
+
+
+def _kill(process):
+    if hasattr(os, "killpg"):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+    else:
+        process.kill()
+    process.join()
+
+
+def _probabilities(simulator, circuit):
+    probe = circuit.copy()
+    probe.probability(target=circuit.qubits)
+    probabilities = np.asarray(local_simulator(simulator).run(probe, shots=0).result().values[0], dtype=np.float64)
+    # rounding errors of the simulators may result in tiny negative probabilities
+    probabilities = np.clip(probabilities, 0, None)
+    probabilities /= probabilities.sum()
+    return probabilities
+
+
+def _simulate_sharded(simulator, circuit, shots, shard_count):
+    """Simulate the shots in shard_count processes. The Braket simulators seed every run from fresh OS entropy, so
+    the shards draw independent samples."""
+    shard_shots = [shots // shard_count + (1 if i < shots % shard_count else 0) for i in range(shard_count)]
+    # forked processes start without importing braket again, which takes seconds
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+    with ProcessPoolExecutor(max_workers=shard_count, mp_context=context) as executor:
+        shard_counts = list(executor.map(_run_shard, [simulator] * shard_count, [circuit] * shard_count, shard_shots))
+    return merge_counts(shard_counts)
+
+
+def _run_shard(simulator, circuit, shots):
+    return dict(local_simulator(simulator).run(circuit, shots=shots).result().measurement_counts)
+
+
+def _format_bytes(size):
+    for unit in ("B", "KiB", "MiB", "GiB", "TiB"):
+        if size < 1024 or unit == "TiB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
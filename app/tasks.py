@@ -17,27 +17,350 @@
 #  limitations under the License.
 # ******************************************************************************
 
-from app import implementation_handler, braket_handler, db
+from app import app, implementation_handler, braket_handler, cancellation, db, device_catalog, metrics, noise_models, \
+    profiling, remote_tracker, result_memo, result_notifications, sampling
 from rq import get_current_job
 
+from app.profile_model import Profile
 from app.result_model import Result
 import logging
-import json
 import base64
+import json
+import time
+import uuid
+from datetime import datetime
 
 
-def execute(impl_url, impl_data, impl_language, input_params, braket_ir, token, qpu_name, shots, bearer_token: str):
-    """Create database entry for result. Get implementation code, prepare it, and execute it. Save result in db"""
+def execute(impl_url, impl_data, impl_language, input_params, braket_ir, token, qpu_name, shots, bearer_token: str,
+            memo_key=None, noise_model=noise_models.DEFAULT, seed=None, profile=False):
+    """Create database entry for result. Get implementation code, prepare it, and execute it. Save result in db.
+    If profile is set, the preparation and the execution are profiled and the profile is saved with the result."""
     job = get_current_job()
+    metrics.start(job)
+    # the worker runs one job at a time, so the allocations it traces are those of the job
+    profiling.start(profile, trace_memory=True)
 
 
 
     logging.info('Preparing implementation...')
+    try:
+        with profiling.section():
+            circuit = _prepare_circuit(impl_url, impl_data, impl_language, braket_ir, input_params, bearer_token)
+    except Exception:
+        logging.exception('Preparing the circuit failed')
+        circuit = None
+
+    if not circuit:
+        _store_error(job.get_id(), {'error': 'URL not found or Error during restoration of braket circuit.'},
+                     memo_key)
+        return
+
+    logging.info('Transpiling skipped for braket.')
+
+    if cancellation.requested(job.get_id()):
+        logging.info('The job was canceled')
+        return
+
+    transpiled_circuit = circuit
+
+
+    if qpu_name.lower() != 'local-simulator':
+        # the worker is released right after the submission, the remote tracker stores the result of the task
+        logging.info('Submitting quantum task...')
+        try:
+            clients = braket_handler.get_clients()
+            _check_device(transpiled_circuit, qpu_name, clients[0])
+            with profiling.section():
+                task_arn = braket_handler.submit_remotely(transpiled_circuit, shots, qpu_name, clients)
+        except ValueError as e:
+            _store_result(job.get_id(), {'error': str(e)})
+            return
+        except Exception:
+            logging.exception(f'Submitting the quantum task to {qpu_name} failed')
+            _store_result(job.get_id(), {'error': 'submission failed'})
+            return
+        with metrics.stage("commit"):
+            recorded = Result.update_unfinished(job.get_id(), task_arn=task_arn, submitted_at=datetime.utcnow())
+            if recorded:
+                _set_profile(job.get_id())
+            db.session.commit()
+        if not recorded:
+            # the job was canceled during the submission, when its result did not know the task yet
+            cancellation.cancel_task(task_arn)
+            return
+        _store_timings(job.get_id())
+        return
+
+    try:
+        braket_handler.check_circuit_memory(transpiled_circuit, noise_model)
+        sampling.check_seed(transpiled_circuit, seed)
+    except ValueError as e:
+        _store_error(job.get_id(), {'error': str(e)}, memo_key)
+        return
+
+    circuit_memo_key = None
+    if memo_key:
+        # different implementations or parameters may still result in a circuit that was executed before
+        circuit_memo_key = result_memo.circuit_key(transpiled_circuit, shots, qpu_name, noise_model.name, seed)
+        memoized = result_memo.lookup(circuit_memo_key)
+        memoized_result = Result.query.get(memoized) if memoized else None
+        if memoized_result and memoized_result.complete:
+            logging.info(f'Memoized result {memoized} is used')
+            with metrics.stage("commit"):
+                aliased = Result.update_unfinished(job.get_id(), alias_of=memoized, complete=True)
+                if aliased:
+                    _set_profile(job.get_id())
+                db.session.commit()
+            if aliased:
+                result_notifications.publish(job.get_id())
+                _store_timings(job.get_id())
+            return
+
+    logging.info('Start executing...')
+    try:
+        with profiling.section():
+            job_result = braket_handler.execute_job(transpiled_circuit, shots, qpu_name, noise_model, seed,
+                                                    _simulation_timeout(job), job.get_id())
+    except cancellation.Canceled:
+        logging.info('The simulation was canceled')
+        return
+    if job_result:
+        # a result that was canceled meanwhile is not remembered
+        if _store_result(job.get_id(), job_result) and circuit_memo_key:
+            result_memo.remember(circuit_memo_key, job.get_id())
+    else:
+        _store_error(job.get_id(), {'error': 'execution failed'}, memo_key)
+
+
+def execute_batch(circuits, qpu_name, shots, bearer_token: str, noise_model=noise_models.DEFAULT):
+    """Prepare all circuits of a batch, execute them grouped by backend and shots, and save every result in the db.
+    Each entry of circuits holds the id of its result and the same implementation fields as an execution request."""
+    job = get_current_job()
+    metrics.start(job)
+    # all groups share the time the job may simulate
+    deadline = _deadline(job)
+
+    logging.info(f'Preparing {len(circuits)} implementations...')
+    groups = {}
+    for entry in circuits:
+        try:
+            circuit = _prepare_circuit(entry.get('impl_url'), entry.get('impl_data'), entry.get('impl_language', ''),
+                                       entry.get('braket_ir'), entry.get('input_params', ''), bearer_token)
+        except Exception:
+            logging.exception(f"Preparing the circuit of result {entry['result_id']} failed")
+            circuit = None
+        if not circuit:
+            _store_result(entry['result_id'],
+                          {'error': 'URL not found or Error during restoration of braket circuit.'})
+            continue
+        circuit_qpu_name = entry.get('qpu_name') or qpu_name
+        density_matrix = False
+        if circuit_qpu_name.lower() == 'local-simulator':
+            try:
+                braket_handler.check_circuit_memory(circuit, noise_model)
+            except ValueError as e:
+                _store_result(entry['result_id'], {'error': str(e)})
+                continue
+            # circuits that need the density matrix simulator do not slow down the others
+            density_matrix = braket_handler.needs_density_matrix(circuit, noise_model)
+        else:
+            try:
+                _check_device(circuit, circuit_qpu_name)
+            except ValueError as e:
+                _store_result(entry['result_id'], {'error': str(e)})
+                continue
+        key = (circuit_qpu_name, entry.get('shots') or shots, density_matrix)
+        groups.setdefault(key, []).append((entry['result_id'], circuit))
+
+    for (group_qpu_name, group_shots, _), group in groups.items():
+        if cancellation.requested(job.get_id()):
+            logging.info('The batch was canceled')
+            return
+        if group_qpu_name.lower() != 'local-simulator':
+            _submit_batch(group, group_shots, group_qpu_name)
+            continue
+        logging.info(f'Start executing {len(group)} circuits on {group_qpu_name}...')
+        try:
+            job_results = braket_handler.execute_batch([circuit for _, circuit in group], group_shots, group_qpu_name,
+                                                       max_parallel=app.config['BATCH_MAX_PARALLEL'],
+                                                       noise_model=noise_model, timeout=_remaining(deadline),
+                                                       job_id=job.get_id())
+        except cancellation.Canceled:
+            logging.info('The batch was canceled')
+            return
+        except TimeoutError:
+            logging.error(f'The batch execution on {group_qpu_name} did not finish in time')
+            job_results = [None] * len(group)
+        except Exception:
+            logging.exception(f'Batch execution on {group_qpu_name} failed')
+            job_results = [None] * len(group)
+        for (result_id, _), job_result in zip(group, job_results):
+            _store_result(result_id, job_result if job_result else {'error': 'execution failed'})
+
+    children = Result.query.filter_by(parent_id=job.get_id()).all()
+    _store_result(job.get_id(), {child.id: '/braket-service/api/v1.0/results/' + child.id for child in children})
+
+
+def execute_sweep(impl_url, impl_data, impl_language, input_params, sweep, braket_ir, qpu_name, shots,
+                  bearer_token: str, noise_model=noise_models.DEFAULT, profile=False):
+    """Prepare the circuit once, bind every parameter set of the sweep to it, and execute all bound circuits as one
+    batch. Save the histograms of all parameter sets as a single result in db"""
+    job = get_current_job()
+    metrics.start(job)
+    profiling.start(profile, trace_memory=True)
+
+    points = input_params.sweep_points(sweep)
+    logging.info(f'Preparing implementation for {len(points)} parameter sets...')
+    with profiling.section():
+        circuits = _prepare_sweep(impl_url, impl_data, points, bearer_token)
+
+    if not circuits:
+        _store_result(job.get_id(), {'error': 'URL not found or Error during restoration of braket circuit.'})
+        return
+
+    try:
+        for circuit in circuits:
+            if qpu_name.lower() == 'local-simulator':
+                braket_handler.check_circuit_memory(circuit, noise_model)
+            else:
+                _check_device(circuit, qpu_name)
+    except ValueError as e:
+        _store_result(job.get_id(), {'error': str(e)})
+        return
+
+    if cancellation.requested(job.get_id()):
+        logging.info('The sweep was canceled')
+        return
+
+    names = [name for name, value in input_params.items() if isinstance(value, list)]
+    if qpu_name.lower() != 'local-simulator':
+        with profiling.section():
+            _submit_sweep(job.get_id(), circuits, names, points, shots, qpu_name)
+        _set_profile(job.get_id())
+        db.session.commit()
+        return
+
+    logging.info(f'Start executing {len(circuits)} circuits...')
+    try:
+        with profiling.section():
+            job_results = braket_handler.execute_batch(circuits, shots, qpu_name,
+                                                       max_parallel=app.config['BATCH_MAX_PARALLEL'],
+                                                       noise_model=noise_model, timeout=_simulation_timeout(job),
+                                                       job_id=job.get_id())
+    except cancellation.Canceled:
+        logging.info('The sweep was canceled')
+        return
+    except TimeoutError:
+        logging.error('The sweep did not finish in time')
+        job_results = [None] * len(circuits)
+    except Exception:
+        logging.exception('The sweep execution failed')
+        _store_result(job.get_id(), {'error': 'execution failed'})
+        return
+    _store_result(job.get_id(), {
+        'parameters': names,
+        'points': [[point[name] for name in names] for point in points],
+        'counts': [job_result if job_result else {'error': 'execution failed'} for job_result in job_results],
+    })
+
+
+def _prepare_sweep(impl_url, impl_data, points, bearer_token):
+    if impl_url:
+        impl = implementation_handler.get_implementation_from_url(impl_url, bearer_token)
+    else:
+        impl = base64.b64decode(impl_data.encode()).decode()
+    if not impl:
+        return None
+    # the implementation runs once and only its get_circuit function is called per parameter set
+    return implementation_handler.prepare_circuits_from_data(impl, points)
+
+
+def _submit_batch(group, shots, qpu_name):
+    """Submit the circuits of a batch to the QPU and record their quantum tasks with their results, which the remote
+    tracker stores like those of single executions."""
+    logging.info(f'Submitting {len(group)} quantum tasks to {qpu_name}...')
+    try:
+        task_arns = braket_handler.submit_batch([circuit for _, circuit in group], shots, qpu_name,
+                                                braket_handler.get_clients())
+    except Exception:
+        logging.exception(f'Submitting the quantum tasks to {qpu_name} failed')
+        task_arns = [None] * len(group)
+    submitted_at = datetime.utcnow()
+    canceled = []
+    for (result_id, _), task_arn in zip(group, task_arns):
+        if task_arn:
+            if not Result.update_unfinished(result_id, task_arn=task_arn, submitted_at=submitted_at):
+                canceled.append(task_arn)
+        else:
+            _store_result(result_id, {'error': 'submission failed'})
+    db.session.commit()
+    # the batch was canceled during the submission, when its results did not know these tasks yet
+    for task_arn in canceled:
+        cancellation.cancel_task(task_arn)
+
+
+def _submit_sweep(job_id, circuits, names, points, shots, qpu_name):
+    """Submit the circuits of a sweep to the QPU. Every quantum task gets a result of its own, which the remote
+    tracker stores, and the tracker completes the sweep once all of them are stored."""
+    children = [Result(id=str(uuid.uuid4()), parent_id=job_id, backend=qpu_name, shots=shots) for _ in circuits]
+    # the sweep lists its results in the order of the points until the tracker replaces them with their counts
+    pending = {'parameters': names, 'points': [[point[name] for name in names] for point in points],
+               'results': [child.id for child in children]}
+    if not Result.update_unfinished(job_id, **Result.encoded(pending)):
+        # the sweep was canceled
+        db.session.rollback()
+        return
+    db.session.add_all(children)
+    db.session.commit()
+    _submit_batch(list(zip([child.id for child in children], circuits)), shots, qpu_name)
+    # without any submitted task, the tracker would never complete the sweep
+    completed = remote_tracker.complete_sweeps([job_id])
+    db.session.commit()
+    if completed:
+        result_notifications.publish(job_id)
+
+
+def _simulation_timeout(job):
+    """Return the seconds the local simulation of the job may run, which leaves time to store its result before the
+    job times out. The timeout of a job depends on the tier of its queue."""
+    configured = app.config['LOCAL_SIMULATION_TIMEOUT'] or None
+    if job and job.timeout and job.timeout > 0:
+        return min(configured or job.timeout, 0.9 * job.timeout)
+    return configured
+
+
+def _deadline(job):
+    timeout = _simulation_timeout(job)
+    return time.monotonic() + timeout if timeout else None
+
+
+def _remaining(deadline):
+    """Return the seconds left until the deadline, at least one, or None without a deadline."""
+    if deadline is None:
+        return None
+    return max(deadline - time.monotonic(), 1)
+
+
+def _check_device(circuit, qpu_name, braket_client=None):
+    """Raise a ValueError if the circuit cannot run on the device according to the device catalog of the client, by
+    default the one of the service."""
+    # the qubits of a device are addressed by their index, so the highest index of the circuit must exist
+    qubit_count = int(max(circuit.qubits)) + 1 if circuit.qubits else 0
+    try:
+        device_catalog.validate(qpu_name, qubit_count, braket_client)
+    except ValueError:
+        raise
+    except Exception:
+        # without the catalog the device is checked by the Braket API like before
+        logging.exception('The device catalog is not available')
+
+
+def _prepare_circuit(impl_url, impl_data, impl_language, braket_ir, input_params, bearer_token):
     circuit = None
     if braket_ir:
         circuit = implementation_handler.prepare_code_from_braket_ir(braket_ir)
         if len(input_params) > 0:
-            circuit.make_bound_circuit(input_params)
+            circuit = circuit.make_bound_circuit(input_params)
     else:
         if impl_url:
             if impl_language.lower() == 'braket-ir':
@@ -50,27 +373,48 @@ def execute(impl_url, impl_data, impl_language, input_params, braket_ir, token,
                 circuit = implementation_handler.prepare_code_from_braket_ir(impl_data)
             else:
                 circuit = implementation_handler.prepare_code_from_data(impl_data, input_params)
+    return circuit
 
-    if not circuit:
-        result = Result.query.get(job.get_id())
-        result.result = json.dumps({'error': 'URL not found or Error during restoration of braket circuit.'})
-        result.complete = True
+
+def _store_error(result_id, error, memo_key):
+    # failed executions are not memoized, so the next identical request is executed again, and the memo key of a
+    # canceled execution was already released or handed over, see cancellation.cancel
+    if memo_key and not cancellation.requested(result_id):
+        result_memo.forget(memo_key)
+    _store_result(result_id, error)
+
+
+def _store_result(result_id, job_result):
+    """Store the job result and return whether it was stored, which it is not if the result was finalized when its
+    execution was canceled."""
+    job = get_current_job()
+    own_result = job and job.get_id() == result_id
+    with metrics.stage("commit"):
+        stored = Result.finalize(result_id, job_result)
+        if stored and own_result:
+            _set_profile(result_id)
         db.session.commit()
+    if not stored:
+        return False
+    result_notifications.publish(result_id)
+    if own_result:
+        _store_timings(result_id)
+    return True
 
-    logging.info('Transpiling skipped for braket.')
 
-    transpiled_circuit = circuit
+def _set_profile(result_id):
+    """Add the profile of the current job under the id of its result, so that it is committed and published with
+    it."""
+    profile = profiling.finish()
+    if profile is not None:
+        db.session.merge(Profile(id=result_id, stats=profile.stats(), report=profile.report()))
 
 
-    logging.info('Start executing...')
-    job_result = braket_handler.execute_job(transpiled_circuit, shots, qpu_name)
-    if job_result:
-        result = Result.query.get(job.get_id())
-        result.result = json.dumps(job_result)
-        result.complete = True
-        db.session.commit()
-    else:
-        result = Result.query.get(job.get_id())
-        result.result = json.dumps({'error': 'execution failed'})
-        result.complete = True
-        db.session.commit()
+def _store_timings(result_id):
+    """Save the stage timings of the current job with its result. This happens after the result was published,
+    so that the timings include the commit of the result without delaying the clients."""
+    timings = metrics.current()
+    if timings is None:
+        return
+    Result.query.filter_by(id=result_id).update({'timings': json.dumps(timings)})
+    db.session.commit()
@@ -0,0 +1,92 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import argparse
+import logging
+import os
+import signal
+import time
+from datetime import datetime
+
+from rq import SimpleWorker
+
+from app import admission, app, job_queues
+
+
+class WarmWorker(SimpleWorker):
+    """Worker that executes the jobs in its own process, so the preloaded modules, simulators and clients are reused
+    by all jobs instead of being set up again in a forked work horse. Logs the startup latency of every job and releases
+    its estimated work from the admission control when it is finished."""
+
+    def execute_job(self, job, queue):
+        self._dequeued_at = time.monotonic()
+        super().execute_job(job, queue)
+
+    def perform_job(self, job, queue):
+        started = time.monotonic()
+        if job.enqueued_at:
+            queued = (datetime.utcnow() - job.enqueued_at.replace(tzinfo=None)).total_seconds()
+            logging.info(f"Job {job.id} starts after {queued:.3f} s in the queue and "
+                         f"{(started - self._dequeued_at) * 1000:.1f} ms of startup")
+        try:
+            return super().perform_job(job, queue)
+        finally:
+            logging.info(f"Job {job.id} took {time.monotonic() - started:.3f} s")
+            admission.finished(job.id)
+
+
+def _reset_signal_handlers():
+    # processes forked by the jobs, e.g. the simulations and the pools of run_batch, would inherit the handlers that
+    # RQ installs in the worker, with which they log a warm shut down on SIGTERM instead of exiting
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+
+def preload():
+    """Import the modules of the jobs and create the local simulators before the first job arrives."""
+    started = time.monotonic()
+    import numpy  # noqa: F401
+    from braket.circuits import Circuit
+    from app import sampling, tasks  # noqa: F401
+
+    for name in ("braket_sv", "braket_dm"):
+        # the first run of a simulator initializes code paths that all later runs use
+        sampling.local_simulator(name).run(Circuit().h(0), shots=1).result()
+    logging.info(f"Worker preloaded in {time.monotonic() - started:.3f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Execute the jobs of the queues of the tiers, which are given in the "
+                                                 "order of their priority, by default of all tiers.")
+    parser.add_argument("tiers", nargs="*", metavar="tier", help=", ".join(job_queues.TIERS))
+    tiers = parser.parse_args().tiers or list(job_queues.TIERS)
+    unknown = [tier for tier in tiers if tier not in job_queues.TIERS]
+    if unknown:
+        parser.error(f"unknown tiers: {', '.join(unknown)}")
+
+    logging.basicConfig(level=logging.INFO)
+    os.register_at_fork(after_in_child=_reset_signal_handlers)
+    with app.app_context():
+        preload()
+        worker = WarmWorker([app.execute_queues[tier] for tier in tiers], connection=app.redis)
+        worker.work()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+"""A local stub of the parts of the Amazon Braket and S3 APIs that the service calls, with configurable latency.
+
+The service is pointed to it with BRAKET_ENDPOINT_URL and S3_ENDPOINT_URL. Quantum tasks complete task_duration
+seconds after their creation with an even split of their shots between the all-zeros and all-ones outcome.
+"""
+import json
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+from xml.sax.saxutils import escape
+
+DEVICE_ARN = "arn:aws:braket:::device/qpu/stub/Stub-1"
+DEVICE_QUBITS = 32
+
+_S3_NAMESPACE = "http://s3.amazonaws.com/doc/2006-03-01/"
+_RANGE = re.compile(r"bytes=(\d+)-(\d*)")
+
+
+class AwsStub:
+    def __init__(self, latency=0.0, task_duration=1.0):
+        self.latency = latency
+        self.task_duration = task_duration
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._tasks = {}
+        self._buckets = {}
+        self._server = None
+
+    def start(self):
+        """Serve the stub in a background thread and return its URL."""
+        stub = self
+
+        class Handler(_Handler):
+            pass
+        Handler.stub = stub
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def create_task(self, request):
+        task_id = str(uuid.uuid4())
+        arn = f"arn:aws:braket:us-east-1:000000000000:quantum-task/{task_id}"
+        action = json.loads(request["action"])
+        qubit_count = _qubit_count(action)
+        shots = request["shots"]
+        directory = f"{request['outputS3KeyPrefix']}/{task_id}"
+        counts = {"0" * qubit_count: shots - shots // 2, "1" * qubit_count: shots // 2}
+        with self._lock:
+            self._tasks[arn] = {
+                "quantumTaskArn": arn, "deviceArn": request["deviceArn"], "shots": shots,
+                "outputS3Bucket": request["outputS3Bucket"], "outputS3Directory": directory,
+                "created": time.time(), "cancelled": False,
+            }
+            self._buckets.setdefault(request["outputS3Bucket"], {})[directory + "/results.json"] = \
+                json.dumps({"measurementCounts": counts}).encode()
+        return {"quantumTaskArn": arn}
+
+    def task_summary(self, arn):
+        with self._lock:
+            task = dict(self._tasks[arn])
+        created = task.pop("created")
+        cancelled = task.pop("cancelled")
+        ended = created + self.task_duration
+        if cancelled:
+            task["status"] = "CANCELLED"
+        elif time.time() >= ended:
+            task["status"] = "COMPLETED"
+            task["endedAt"] = _timestamp(ended)
+        else:
+            task["status"] = "QUEUED"
+        task["createdAt"] = _timestamp(created)
+        return task
+
+    def search_tasks(self, request):
+        since = None
+        for task_filter in request.get("filters", []):
+            if task_filter["name"] == "createdAt" and task_filter["operator"] == "GTE":
+                since = _epoch(task_filter["values"][0])
+        with self._lock:
+            arns = [arn for arn, task in self._tasks.items() if since is None or task["created"] >= since]
+        start = int(request.get("nextToken") or 0)
+        page = arns[start:start + 100]
+        response = {"quantumTasks": [self.task_summary(arn) for arn in page]}
+        if start + 100 < len(arns):
+            response["nextToken"] = str(start + 100)
+        return response
+
+    def cancel_task(self, arn):
+        with self._lock:
+            self._tasks[arn]["cancelled"] = True
+        return {"quantumTaskArn": arn, "cancellationStatus": "CANCELLED"}
+
+    def device(self, arn):
+        capabilities = {
+            "paradigm": {"qubitCount": DEVICE_QUBITS, "nativeGateSet": ["rx", "rz", "cz"]},
+            "action": {"braket.ir.jaqcd.program": {"supportedOperations": ["h", "x", "rx", "rz", "cnot", "cz"],
+                                                   "supportedResultTypes": [{"name": "Sample"}]}},
+        }
+        return {"deviceArn": arn, "deviceName": "Stub-1", "providerName": "stub", "deviceType": "QPU",
+                "deviceStatus": "ONLINE", "deviceCapabilities": json.dumps(capabilities)}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    stub = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def do_HEAD(self):
+        self._handle("HEAD")
+
+    def _handle(self, method):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        with self.stub._lock:
+            self.stub.requests += 1
+        time.sleep(self.stub.latency)
+        path = unquote(self.path.split("?", 1)[0])
+        try:
+            if path.startswith(("/quantum-task", "/device")):
+                self._braket(method, path, json.loads(body) if body else {})
+            else:
+                self._s3(method, path)
+        except KeyError:
+            self._send(404, b'{"message": "not found"}', "application/json")
+
+    def _braket(self, method, path, request):
+        stub = self.stub
+        if method == "POST" and path == "/quantum-task":
+            return self._json(stub.create_task(request), 201)
+        if method == "POST" and path == "/quantum-tasks":
+            return self._json(stub.search_tasks(request))
+        if method == "PUT" and path.startswith("/quantum-task/") and path.endswith("/cancel"):
+            return self._json(stub.cancel_task(path[len("/quantum-task/"):-len("/cancel")]))
+        if method == "GET" and path.startswith("/quantum-task/"):
+            return self._json(stub.task_summary(path[len("/quantum-task/"):]))
+        if method == "POST" and path == "/devices":
+            return self._json({"devices": [{key: value for key, value in stub.device(DEVICE_ARN).items()
+                                            if key != "deviceCapabilities"}]})
+        if method == "GET" and path.startswith("/device/"):
+            arn = path[len("/device/"):]
+            if arn != DEVICE_ARN:
+                raise KeyError(arn)
+            return self._json(stub.device(arn))
+        raise KeyError(path)
+
+    def _s3(self, method, path):
+        stub = self.stub
+        bucket, _, key = path.lstrip("/").partition("/")
+        if not bucket:
+            with stub._lock:
+                names = list(stub._buckets)
+            buckets = "".join(f"<Bucket><Name>{escape(name)}</Name>"
+                              f"<CreationDate>2021-01-01T00:00:00.000Z</CreationDate></Bucket>" for name in names)
+            return self._send(200, f'<?xml version="1.0" encoding="UTF-8"?><ListAllMyBucketsResult xmlns='
+                                   f'"{_S3_NAMESPACE}"><Owner><ID>stub</ID></Owner><Buckets>{buckets}</Buckets>'
+                                   f'</ListAllMyBucketsResult>'.encode(), "application/xml")
+        if method == "PUT" and not key:
+            with stub._lock:
+                stub._buckets.setdefault(bucket, {})
+            return self._send(200, b"", "application/xml")
+        with stub._lock:
+            data = stub._buckets[bucket][key]
+        match = _RANGE.match(self.headers.get("Range") or "")
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2)) if match.group(2) else len(data) - 1, len(data) - 1)
+            return self._send(206, data[start:end + 1], "application/octet-stream",
+                              {"Content-Range": f"bytes {start}-{end}/{len(data)}"}, method == "HEAD")
+        return self._send(200, data, "application/octet-stream", head=method == "HEAD")
+
+    def _json(self, response, status=200):
+        self._send(status, json.dumps(response).encode(), "application/json")
+
+    def _send(self, status, body, content_type, headers=None, head=False):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+
+def _qubit_count(action):
+    if "instructions" in action:
+        qubits = set()
+        for instruction in action["instructions"]:
+            qubits.update(instruction.get("targets", []) + instruction.get("controls", []))
+            for name in ("target", "control"):
+                if name in instruction:
+                    qubits.add(instruction[name])
+        return max(qubits) + 1 if qubits else 1
+    # OpenQASM programs declare their qubits as qubit[n]
+    match = re.search(r"qubit\[(\d+)\]", action.get("source", ""))
+    return int(match.group(1)) if match else 1
+
+
+def _timestamp(epoch):
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
+
+
+def _epoch(value):
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
@@ -0,0 +1,50 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+"""Benchmarks of local simulations across qubit and shot counts."""
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from app import braket_handler, noise_models, sampling  # noqa: E402
+from benchmarks.circuits import random_circuit  # noqa: E402
+
+
+@pytest.mark.benchmark(group="execute_locally")
+@pytest.mark.parametrize("shots", [100, 10000, 1000000])
+@pytest.mark.parametrize("qubit_count", [4, 10, 16])
+def bench_execute_noiseless(benchmark, qubit_count, shots):
+    circuit = random_circuit(qubit_count, 10 * qubit_count)
+    _run(benchmark, circuit, shots, noise_models.NOISELESS)
+
+
+@pytest.mark.benchmark(group="execute_locally")
+@pytest.mark.parametrize("qubit_count", [2, 6])
+def bench_execute_noisy(benchmark, qubit_count):
+    circuit = random_circuit(qubit_count, 10 * qubit_count)
+    _run(benchmark, circuit, 1000, noise_models.DEFAULT)
+
+
+def _run(benchmark, circuit, shots, noise_model):
+    def setup():
+        # the noise model is applied to the circuit in place and the distribution would be cached
+        sampling._distributions.clear()
+        return (circuit.copy(), shots, noise_model, 1), {}
+
+    counts = benchmark.pedantic(braket_handler.execute_locally, setup=setup, rounds=5)
+    assert sum(counts.values()) == shots
@@ -0,0 +1,89 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+"""Benchmarks of turning implementations and input parameters into circuits."""
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from app import circuit_cache, implementation_handler, parameters  # noqa: E402
+from benchmarks.circuits import random_braket_ir, random_implementation, read_sample  # noqa: E402
+
+GATE_COUNTS = [10, 100, 1000, 10000]
+
+
+@pytest.mark.benchmark(group="prepare_code_from_braket_ir")
+def bench_prepare_sample_braket_ir(benchmark):
+    braket_ir = read_sample("circuit_braket_ir.json")
+    benchmark.pedantic(implementation_handler.prepare_code_from_braket_ir, args=(braket_ir,),
+                       setup=_clear_circuits, rounds=50)
+
+
+@pytest.mark.benchmark(group="prepare_code_from_braket_ir")
+@pytest.mark.parametrize("gate_count", GATE_COUNTS)
+def bench_prepare_random_braket_ir(benchmark, gate_count):
+    braket_ir = random_braket_ir(16, gate_count)
+    benchmark.pedantic(implementation_handler.prepare_code_from_braket_ir, args=(braket_ir,),
+                       setup=_clear_circuits, rounds=max(5, 10000 // gate_count))
+
+
+@pytest.mark.benchmark(group="prepare_code_from_braket_ir")
+def bench_prepare_cached_braket_ir(benchmark):
+    braket_ir = random_braket_ir(16, 1000)
+    implementation_handler.prepare_code_from_braket_ir(braket_ir)
+    benchmark(implementation_handler.prepare_code_from_braket_ir, braket_ir)
+
+
+@pytest.mark.benchmark(group="prepare_code_from_data")
+def bench_prepare_sample_implementation(benchmark):
+    implementation = read_sample("circuit_braket.py")
+    benchmark(implementation_handler.prepare_code_from_data, implementation, {"param1": 0.5})
+
+
+@pytest.mark.benchmark(group="prepare_code_from_data")
+@pytest.mark.parametrize("gate_count", GATE_COUNTS[:3])
+def bench_prepare_random_implementation(benchmark, gate_count):
+    implementation = random_implementation(16, gate_count)
+    benchmark.pedantic(implementation_handler.prepare_code_from_data, args=(implementation, {"angle": 0.5}),
+                       setup=implementation_handler._compiled_implementations.clear, rounds=max(5, 1000 // gate_count))
+
+
+@pytest.mark.benchmark(group="ParameterDictionary")
+@pytest.mark.parametrize("count", [10, 1000])
+def bench_scalar_parameters(benchmark, count):
+    raw = {}
+    for i in range(count):
+        raw[f"string{i}"] = {"rawValue": f"value{i}", "type": "String"}
+        raw[f"integer{i}"] = {"rawValue": str(i), "type": "Integer"}
+        raw[f"float{i}"] = {"rawValue": str(i / 3), "type": "Float"}
+    benchmark(parameters.ParameterDictionary, raw)
+
+
+@pytest.mark.benchmark(group="ParameterDictionary")
+@pytest.mark.parametrize("length", [10, 10000])
+def bench_array_parameters(benchmark, length):
+    raw = {
+        "floats": {"rawValue": ",".join(str(i / 3) for i in range(length)), "type": "FloatArray"},
+        "integers": {"rawValue": str(list(range(length))), "type": "IntegerArray"},
+    }
+    benchmark(parameters.ParameterDictionary, raw)
+
+
+def _clear_circuits():
+    circuit_cache._circuits.clear()
+    implementation_handler._decoded_matrices.clear()
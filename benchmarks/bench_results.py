@@ -0,0 +1,79 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+"""Benchmarks of serializing results and of storing and loading them in the database."""
+import json
+import uuid
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from app import db  # noqa: E402
+from app.NumpyEncoder import NumpyEncoder  # noqa: E402
+from app.result_model import Result  # noqa: E402
+
+OUTCOME_COUNTS = [16, 1024, 65536]
+
+
+@pytest.mark.benchmark(group="NumpyEncoder")
+@pytest.mark.parametrize("size", [1000, 100000, 1000000])
+def bench_numpy_encoder(benchmark, size):
+    array = np.random.default_rng(42).standard_normal(size)
+    benchmark(json.dumps, array, cls=NumpyEncoder)
+
+
+@pytest.mark.benchmark(group="Result write")
+@pytest.mark.parametrize("outcome_count", OUTCOME_COUNTS)
+def bench_write_result(benchmark, app_context, outcome_count):
+    histogram = _histogram(outcome_count)
+
+    def write():
+        result = Result(id=str(uuid.uuid4()), backend="local-simulator", shots=sum(histogram.values()))
+        result.result = histogram
+        result.complete = True
+        db.session.add(result)
+        db.session.commit()
+
+    benchmark.pedantic(write, rounds=20)
+
+
+@pytest.mark.benchmark(group="Result read")
+@pytest.mark.parametrize("outcome_count", OUTCOME_COUNTS)
+def bench_read_result(benchmark, app_context, outcome_count):
+    histogram = _histogram(outcome_count)
+    result = Result(id=str(uuid.uuid4()), backend="local-simulator", shots=sum(histogram.values()))
+    result.result = histogram
+    result.complete = True
+    db.session.add(result)
+    db.session.commit()
+    result_id = result.id
+
+    def read():
+        return Result.query.get(result_id).result
+
+    # the session would otherwise return the already loaded result
+    loaded = benchmark.pedantic(read, setup=db.session.expunge_all, rounds=20)
+    assert loaded == histogram
+
+
+def _histogram(outcome_count):
+    width = max(1, (outcome_count - 1).bit_length())
+    counts = np.random.default_rng(42).integers(1, 1000, outcome_count)
+    return {format(outcome, f"0{width}b"): int(count) for outcome, count in enumerate(counts)}
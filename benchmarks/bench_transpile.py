@@ -0,0 +1,50 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+"""Benchmarks of the metrics computed by /transpile."""
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from app import circuit_analyzer  # noqa: E402
+from benchmarks.circuits import random_braket_ir, random_circuit, read_sample  # noqa: E402
+
+GATE_COUNTS = [10, 100, 1000, 10000]
+
+
+@pytest.mark.benchmark(group="analyze_braket_ir")
+def bench_analyze_sample_braket_ir(benchmark):
+    braket_ir = read_sample("circuit_braket_ir.json")
+    benchmark.pedantic(circuit_analyzer.analyze_braket_ir, args=(braket_ir,), setup=circuit_analyzer._metrics.clear,
+                       rounds=100)
+
+
+@pytest.mark.benchmark(group="analyze_braket_ir")
+@pytest.mark.parametrize("gate_count", GATE_COUNTS)
+def bench_analyze_random_braket_ir(benchmark, gate_count):
+    braket_ir = random_braket_ir(16, gate_count)
+    benchmark.pedantic(circuit_analyzer.analyze_braket_ir, args=(braket_ir,), setup=circuit_analyzer._metrics.clear,
+                       rounds=max(5, 10000 // gate_count))
+
+
+@pytest.mark.benchmark(group="analyze_circuit")
+@pytest.mark.parametrize("gate_count", GATE_COUNTS[:3])
+def bench_analyze_random_circuit(benchmark, gate_count):
+    circuit = random_circuit(16, gate_count)
+    benchmark.pedantic(circuit_analyzer.analyze_circuit, args=(circuit,), setup=circuit_analyzer._metrics.clear,
+                       rounds=max(5, 1000 // gate_count))
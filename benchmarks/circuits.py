@@ -0,0 +1,96 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+"""The sample implementations and random circuits that the benchmarks run on."""
+import json
+import os
+import random
+
+SAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Sample Implementations")
+
+SINGLE_QUBIT_GATES = ["h", "x", "y", "z", "s", "t"]
+ROTATION_GATES = ["rx", "ry", "rz"]
+TWO_QUBIT_GATES = ["cnot", "cz", "swap"]
+
+
+def read_sample(name):
+    with open(os.path.join(SAMPLES, name)) as file:
+        return file.read()
+
+
+def random_instructions(qubit_count, gate_count, seed=42):
+    """Return gate_count random JAQCD instructions on qubit_count qubits."""
+    rng = random.Random(seed)
+    instructions = []
+    for _ in range(gate_count):
+        kind = rng.random()
+        if kind < 0.4 or qubit_count < 2:
+            instructions.append({"type": rng.choice(SINGLE_QUBIT_GATES), "target": rng.randrange(qubit_count)})
+        elif kind < 0.7:
+            instructions.append({"type": rng.choice(ROTATION_GATES), "target": rng.randrange(qubit_count),
+                                 "angle": rng.uniform(-3.14, 3.14)})
+        else:
+            control, target = rng.sample(range(qubit_count), 2)
+            gate = rng.choice(TWO_QUBIT_GATES)
+            if gate == "swap":
+                instructions.append({"type": gate, "targets": [control, target]})
+            else:
+                instructions.append({"type": gate, "control": control, "target": target})
+    return instructions
+
+
+def random_braket_ir(qubit_count, gate_count, seed=42):
+    """Return the Braket-IR string of a random circuit."""
+    return json.dumps({"braketSchemaHeader": {"name": "braket.ir.jaqcd.program", "version": "1"},
+                       "instructions": random_instructions(qubit_count, gate_count, seed)})
+
+
+def random_circuit(qubit_count, gate_count, seed=42):
+    """Return a random circuit that measures all its qubits."""
+    from braket.circuits import Circuit
+    circuit = Circuit()
+    for instruction in random_instructions(qubit_count, gate_count, seed):
+        add = getattr(circuit, instruction["type"])
+        if "angle" in instruction:
+            add(instruction["target"], instruction["angle"])
+        elif "control" in instruction:
+            add(instruction["control"], instruction["target"])
+        elif "targets" in instruction:
+            add(*instruction["targets"])
+        else:
+            add(instruction["target"])
+    # gates may leave out qubits, the identity keeps all qubits in the circuit
+    for qubit in set(range(qubit_count)) - set(int(qubit) for qubit in circuit.qubits):
+        circuit.i(qubit)
+    return circuit
+
+
+def random_implementation(qubit_count, gate_count, seed=42):
+    """Return the code of a Python implementation whose get_circuit builds a random circuit."""
+    lines = ["from braket.circuits import Circuit", "", "", "def get_circuit(angle):", "    circuit = Circuit()"]
+    for instruction in random_instructions(qubit_count, gate_count, seed):
+        if "angle" in instruction:
+            lines.append(f"    circuit.{instruction['type']}({instruction['target']}, angle)")
+        elif "control" in instruction:
+            lines.append(f"    circuit.{instruction['type']}({instruction['control']}, {instruction['target']})")
+        elif "targets" in instruction:
+            lines.append(f"    circuit.{instruction['type']}(*{instruction['targets']})")
+        else:
+            lines.append(f"    circuit.{instruction['type']}({instruction['target']})")
+    lines.append("    return circuit")
+    return "\n".join(lines) + "\n"
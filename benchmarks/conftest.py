@@ -0,0 +1,55 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+"""Fixtures of the benchmark suite: empty caches for every benchmark and an app on a temporary database."""
+import os
+import tempfile
+
+import pytest
+
+# the app reads its configuration on import, so the database has to be set before
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "benchmark.db"))
+
+from app import app, db, circuit_analyzer, circuit_cache, implementation_handler, sampling  # noqa: E402
+
+
+# --benchmark-storage in pytest.ini is resolved against the working directory, the baselines are kept next to the suite
+_STORAGE = "file://" + os.path.join(os.path.dirname(os.path.abspath(__file__)), ".benchmarks")
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    if config.getoption("benchmark_storage") == "file://.benchmarks":
+        config.option.benchmark_storage = _STORAGE
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Every benchmark starts without the circuits, metrics and distributions cached by the previous ones."""
+    circuit_cache._circuits.clear()
+    circuit_analyzer._metrics.clear()
+    implementation_handler._compiled_implementations.clear()
+    implementation_handler._decoded_matrices.clear()
+    sampling._distributions.clear()
+
+
+@pytest.fixture(scope="session")
+def app_context():
+    with app.app_context():
+        db.create_all()
+        yield app
@@ -0,0 +1,73 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+"""Measures how long the web tier takes to import the app and fails if it got slower or imports the heavy SDKs.
+
+Run from the repository root with: python -m benchmarks.import_time [--budget SECONDS]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# modules that only the endpoints and jobs that execute circuits may import
+HEAVY_MODULES = ["braket", "boto3", "botocore", "sympy"]
+
+REPEAT = 5
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app
+print(json.dumps({"seconds": time.perf_counter() - start, "modules": sorted(sys.modules)}))
+"""
+
+
+def import_app():
+    """Import the app in a fresh interpreter and return the import time and the imported modules."""
+    output = subprocess.run([sys.executable, "-c", PROBE], check=True, stdout=subprocess.PIPE,
+                            env=dict(os.environ, GUNICORN_PRELOAD="false")).stdout
+    probe = json.loads(output.decode().splitlines()[-1])
+    return probe["seconds"], probe["modules"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget", type=float, default=1.5, help="slowest accepted import time in seconds")
+    args = parser.parse_args()
+
+    times = []
+    for _ in range(REPEAT):
+        seconds, modules = import_app()
+        times.append(seconds)
+    heavy = sorted({module.split(".")[0] for module in modules} & set(HEAVY_MODULES))
+    print(f"import app: best {min(times) * 1e3:.1f}ms, worst {max(times) * 1e3:.1f}ms over {REPEAT} runs")
+
+    failures = []
+    if heavy:
+        failures.append(f"importing the app also imports {', '.join(heavy)}")
+    if min(times) > args.budget:
+        failures.append(f"importing the app takes longer than {args.budget * 1e3:.0f}ms")
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+"""Drives the /execute -> RQ -> tasks.execute -> Result pipeline with a mix of transpile, execute and poll traffic.
+
+Everything runs offline in one process: the Flask app serves HTTP on a local port, RQ uses fakeredis, the workers
+run in threads, and quantum tasks for the QPU go to the Braket and S3 stub in benchmarks/aws_stub.py.
+
+Run from the repository root with: python -m benchmarks.load_test [--clients 8] [--workers 4] [--requests 500]
+"""
+import argparse
+import base64
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+
+from benchmarks.aws_stub import AwsStub, DEVICE_ARN
+
+API = "/braket-service/api/v1.0"
+
+IMPLEMENTATION = base64.b64encode(b"""from braket.circuits import Circuit
+
+
+def get_circuit(qubits):
+    circuit = Circuit().h(0)
+    for qubit in range(1, qubits):
+        circuit.cnot(qubit - 1, qubit)
+    return circuit
+""").decode()
+
+
+class Recorder:
+    """Collects latencies by name from many threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.samples.setdefault(name, []).append(seconds)
+
+    def error(self, name):
+        with self._lock:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("transpile", "execute", "poll"):
+            raise argparse.ArgumentTypeError(f"unknown request type {name}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=8, help="concurrent HTTP clients")
+    parser.add_argument("--workers", type=int, default=4, help="RQ workers, each in its own thread")
+    parser.add_argument("--requests", type=int, default=500, help="requests sent by all clients together")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("transpile=1,execute=2,poll=4"),
+                        help="relative weights of the request types, e.g. transpile=1,execute=2,poll=4")
+    parser.add_argument("--qpu-share", type=float, default=0.2, help="share of executions on the stubbed QPU")
+    parser.add_argument("--qubits", type=int, default=4)
+    parser.add_argument("--shots", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds every Braket and S3 call takes")
+    parser.add_argument("--task-duration", type=float, default=1.0, help="seconds until a quantum task completes")
+    parser.add_argument("--timeout", type=float, default=120, help="longest wait for the jobs after the requests")
+    args = parser.parse_args()
+
+    try:
+        import fakeredis
+    except ImportError:
+        parser.exit(1, "The load test needs fakeredis: pip install fakeredis\n")
+
+    stub = AwsStub(args.latency, args.task_duration)
+    stub_url = stub.start()
+    # the app reads its configuration on import
+    os.environ.update({
+        "DATABASE_URL": "sqlite:///" + os.path.join(tempfile.mkdtemp(), "load-test.db"),
+        "AWS_ACCESS_KEY_ID": "stub", "AWS_SECRET_ACCESS_KEY": "stub", "AWS_REGION": "us-east-1",
+        "BRAKET_ENDPOINT_URL": stub_url, "S3_ENDPOINT_URL": stub_url,
+        "TRACKER_MIN_INTERVAL": "0.2", "TRACKER_MAX_INTERVAL": "1",
+    })
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    import urllib3
+    from rq.job import Job
+    from sqlalchemy import event
+    from werkzeug.serving import make_server
+
+    from app import app, db, job_queues, result_notifications
+
+    app.logger.setLevel(logging.WARNING)
+    # the workers share one process, so the simulators run their parallel loops from several threads at once, which
+    # the workqueue threading layer that the Braket simulators select does not allow, and TBB hangs on exit
+    import braket.default_simulator  # noqa: F401
+    import numba
+    numba.config.THREADING_LAYER = "omp"
+    app.redis = fakeredis.FakeStrictRedis()
+    app.execute_queues = job_queues.create(app.redis)
+    with app.app_context():
+        db.create_all()
+        contention = _watch_database(db.engine, event)
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}{API}"
+
+    stop = threading.Event()
+    completed = {}
+    threading.Thread(target=_listen, args=(app.redis, result_notifications.CHANNEL, completed, stop),
+                     daemon=True).start()
+    workers = [threading.Thread(target=_work, args=(app, index, stop), daemon=True) for index in range(args.workers)]
+    tracker = threading.Thread(target=_track, args=(app, stop), daemon=True)
+    for thread in workers + [tracker]:
+        thread.start()
+
+    recorder = Recorder()
+    submitted = {}
+    submitted_lock = threading.Lock()
+    names = list(args.mix)
+    weights = [args.mix[name] for name in names]
+    remaining = [args.requests]
+    http = urllib3.PoolManager(maxsize=args.clients)
+
+    def client(seed):
+        rng = random.Random(seed)
+        while True:
+            with submitted_lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+                known = list(submitted)
+            name = rng.choices(names, weights)[0]
+            if name == "poll" and not known:
+                name = "execute"
+            start = time.perf_counter()
+            if name == "transpile":
+                response = _post(http, base_url + "/transpile", {
+                    "impl-data": IMPLEMENTATION, "impl-language": "Braket",
+                    "input-params": {"qubits": {"rawValue": str(args.qubits), "type": "Integer"}}})
+            elif name == "execute":
+                qpu = DEVICE_ARN if rng.random() < args.qpu_share else "local-simulator"
+                response = _post(http, base_url + "/execute", {
+                    "impl-data": IMPLEMENTATION, "impl-language": "Braket", "qpu-name": qpu, "shots": args.shots,
+                    "input-params": {"qubits": {"rawValue": str(args.qubits), "type": "Integer"}}})
+            else:
+                response = http.request("GET", base_url + "/results/" + rng.choice(known))
+            seconds = time.perf_counter() - start
+            if response.status >= 300 and not (name == "execute" and response.status == 202):
+                recorder.error(name)
+                continue
+            recorder.add(name, seconds)
+            if name == "execute":
+                result_id = response.headers["Location"].rsplit("/", 1)[1]
+                with submitted_lock:
+                    submitted[result_id] = (time.time(), qpu != "local-simulator")
+
+    started = time.time()
+    clients = [threading.Thread(target=client, args=(index,)) for index in range(args.clients)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    requests_done = time.time()
+
+    deadline = time.time() + args.timeout
+    while time.time() < deadline and not set(submitted).issubset(completed):
+        time.sleep(0.05)
+    stop.set()
+    finished = time.time()
+    server.shutdown()
+    stub.stop()
+
+    _report(args, recorder, submitted, completed, contention, started, requests_done, finished,
+            Job.fetch_many(list(submitted), connection=app.redis), stub.requests)
+
+
+def _post(http, url, body):
+    return http.request("POST", url, body=json.dumps(body).encode(), headers={"Content-Type": "application/json"})
+
+
+def _listen(redis, channel, completed, stop):
+    """Record when the completion of every result is published."""
+    pubsub = redis.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(channel)
+    while not stop.is_set():
+        message = pubsub.get_message(timeout=0.05)
+        if message:
+            result_id = message["data"].decode() if isinstance(message["data"], bytes) else message["data"]
+            completed.setdefault(result_id, time.time())
+
+
+def _work(app, index, stop):
+    """Run the jobs of the queue in this thread like the warm worker does in its process."""
+    from rq.timeouts import BaseDeathPenalty
+
+    from app.worker import WarmWorker
+
+    class NoDeathPenalty(BaseDeathPenalty):
+        # the timeouts of the jobs rely on signals, which only the main thread receives
+        def setup_death_penalty(self):
+            pass
+
+        def cancel_death_penalty(self):
+            pass
+
+    class ThreadWorker(WarmWorker):
+        death_penalty_class = NoDeathPenalty
+
+    with app.app_context():
+        worker = ThreadWorker(list(app.execute_queues.values()), connection=app.redis, name=f"load-test-{index}")
+        worker.register_birth()
+        while not stop.is_set():
+            dequeued = worker.dequeue_job_and_maintain_ttl(None)
+            if dequeued is None:
+                time.sleep(0.01)
+                continue
+            job, queue = dequeued
+            worker.execute_job(job, queue)
+        worker.register_death()
+
+
+def _track(app, stop):
+    """Run the remote tracker against the stub until stopped."""
+    import asyncio
+
+    from app import braket_handler, remote_tracker
+
+    async def run():
+        stopped = asyncio.Event()
+
+        async def watch():
+            while not stop.is_set():
+                await asyncio.sleep(0.05)
+            stopped.set()
+
+        watcher = asyncio.ensure_future(watch())
+        await remote_tracker.run(*braket_handler.get_clients(), stop=stopped)
+        await watcher
+
+    with app.app_context():
+        asyncio.run(run())
+
+
+def _watch_database(engine, event):
+    """Record the duration of every write statement and count the ones that waited for a lock."""
+    contention = {"writes": [], "locked": 0}
+    local = threading.local()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before(conn, cursor, statement, parameters, context, executemany):
+        local.start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after(conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith("SELECT"):
+            contention["writes"].append(time.perf_counter() - local.start)
+
+    @event.listens_for(engine, "handle_error")
+    def error(context):
+        if "locked" in str(context.original_exception):
+            contention["locked"] += 1
+
+    return contention
+
+
+def _percentiles(samples):
+    ordered = sorted(samples)
+    if not ordered:
+        return float("nan"), float("nan")
+    return ordered[len(ordered) // 2], ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+
+
+def _report(args, recorder, submitted, completed, contention, started, requests_done, finished, jobs, stub_requests):
+    duration = requests_done - started
+    print(f"{args.requests} requests from {args.clients} clients to {args.workers} workers in {duration:.2f}s "
+          f"({args.requests / duration:.1f} requests/s)")
+    print(f"{'request':>12} {'count':>7} {'errors':>7} {'p50':>10} {'p99':>10}")
+    for name in ("transpile", "execute", "poll"):
+        samples = recorder.samples.get(name, [])
+        p50, p99 = _percentiles(samples)
+        print(f"{name:>12} {len(samples):>7} {recorder.errors.get(name, 0):>7} {p50 * 1e3:>8.1f}ms {p99 * 1e3:>8.1f}ms")
+
+    print(f"{'jobs':>12} {'count':>7} {'done':>7} {'p50':>10} {'p99':>10} {'jobs/s':>8}")
+    for remote in (False, True):
+        ids = [result_id for result_id, (_, is_remote) in submitted.items() if is_remote == remote]
+        done = [completed[result_id] - submitted[result_id][0] for result_id in ids if result_id in completed]
+        p50, p99 = _percentiles(done)
+        last = max((completed[result_id] for result_id in ids if result_id in completed), default=started)
+        rate = len(done) / (last - started) if done and last > started else 0
+        print(f"{'qpu' if remote else 'local':>12} {len(ids):>7} {len(done):>7} {p50 * 1e3:>8.1f}ms "
+              f"{p99 * 1e3:>8.1f}ms {rate:>8.1f}")
+
+    waits = [(job.started_at - job.enqueued_at).total_seconds() for job in jobs
+             if job and job.started_at and job.enqueued_at]
+    p50, p99 = _percentiles(waits)
+    print(f"queue wait: p50 {p50 * 1e3:.1f}ms, p99 {p99 * 1e3:.1f}ms over {len(waits)} jobs")
+    p50, p99 = _percentiles(contention["writes"])
+    print(f"database writes: {len(contention['writes'])}, p50 {p50 * 1e3:.2f}ms, p99 {p99 * 1e3:.2f}ms, "
+          f"{contention['locked']} failed on a lock")
+    print(f"Braket and S3 stub calls: {stub_requests}, drained the jobs {finished - requests_done:.2f}s after the "
+          f"last request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+"""Compares the element-wise decoding of Braket-IR matrices with the vectorized decoding.
+
+Run from the repository root with: python -m benchmarks.matrix_decoding
+"""
+import time
+
+import numpy as np
+
+from app.implementation_handler import _decode_complex_matrix, _decoded_matrices
+
+SIZES = [2 ** exponent for exponent in range(1, 11)]
+
+
+def decode_elementwise(matrix):
+    """Decoding as done before the vectorization. Mutates its input."""
+    for row in matrix:
+        for i in range(len(row)):
+            row[i] = complex(row[i][0], row[i][1])
+    return np.array(matrix)
+
+
+def decode_vectorized(matrix):
+    _decoded_matrices.clear()
+    return _decode_complex_matrix(matrix)
+
+
+def best_time(function, inputs):
+    times = []
+    for matrix in inputs:
+        start = time.perf_counter()
+        function(matrix)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    rng = np.random.default_rng(42)
+    print(f"{'size':>11} {'element-wise':>14} {'vectorized':>14} {'speedup':>9}")
+    for size in SIZES:
+        matrix = rng.standard_normal((size, size, 2)).tolist()
+        repeat = max(3, 2 ** 12 // (size * size))
+        # the element-wise decoding mutates its input, so every run gets its own copy
+        copies = [[[list(entry) for entry in row] for row in matrix] for _ in range(repeat)]
+        assert np.array_equal(decode_elementwise(copies.pop()), decode_vectorized(matrix))
+
+        elementwise = best_time(decode_elementwise, copies)
+        vectorized = best_time(decode_vectorized, [matrix] * repeat)
+        print(f"{size:>5}x{size:<5} {elementwise * 1e3:>12.3f}ms {vectorized * 1e3:>12.3f}ms "
+              f"{elementwise / vectorized:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""add parent_id column to result table
+
+Revision ID: 3a9c51d0b7e2
+Revises: e2f6e8c36cef
+Create Date: 2026-10-17 09:12:44.107513
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3a9c51d0b7e2'
+down_revision = 'e2f6e8c36cef'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('result', sa.Column('parent_id', sa.String(length=36), nullable=True))
+    op.create_index('ix_result_parent_id', 'result', ['parent_id'])
+
+
+def downgrade():
+    op.drop_index('ix_result_parent_id', table_name='result')
+    with op.batch_alter_table('result') as batch_op:
+        batch_op.drop_column('parent_id')
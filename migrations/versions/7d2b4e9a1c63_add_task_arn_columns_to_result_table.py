@@ -0,0 +1,29 @@
+"""add task_arn and submitted_at columns to result table
+
+Revision ID: 7d2b4e9a1c63
+Revises: 3a9c51d0b7e2
+Create Date: 2026-10-17 10:04:31.518230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d2b4e9a1c63'
+down_revision = '3a9c51d0b7e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('result', sa.Column('task_arn', sa.String(length=256), nullable=True))
+    op.add_column('result', sa.Column('submitted_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_result_task_arn', 'result', ['task_arn'])
+
+
+def downgrade():
+    op.drop_index('ix_result_task_arn', table_name='result')
+    with op.batch_alter_table('result') as batch_op:
+        batch_op.drop_column('submitted_at')
+        batch_op.drop_column('task_arn')
@@ -0,0 +1,25 @@
+"""add estimate column to result table
+
+Revision ID: a4d9e7b2c6f8
+Revises: e6c2a8d4f1b3
+Create Date: 2026-10-17 19:12:47.903516
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4d9e7b2c6f8'
+down_revision = 'e6c2a8d4f1b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('result', sa.Column('estimate', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('result') as batch_op:
+        batch_op.drop_column('estimate')
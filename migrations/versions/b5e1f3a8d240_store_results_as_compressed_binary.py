@@ -0,0 +1,57 @@
+"""store results as compressed binary
+
+Revision ID: b5e1f3a8d240
+Revises: 7d2b4e9a1c63
+Create Date: 2026-10-17 10:41:12.903114
+
+"""
+import json
+import zlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e1f3a8d240'
+down_revision = '7d2b4e9a1c63'
+branch_labels = None
+depends_on = None
+
+result = sa.table('result',
+                  sa.column('id', sa.String),
+                  sa.column('result', sa.String),
+                  sa.column('result_data', sa.LargeBinary),
+                  sa.column('result_format', sa.String))
+
+
+def upgrade():
+    op.add_column('result', sa.Column('result_data', sa.LargeBinary(), nullable=True))
+    op.add_column('result', sa.Column('result_format', sa.String(length=32), nullable=True))
+
+    connection = op.get_bind()
+    rows = connection.execute(sa.select([result.c.id, result.c.result]).where(result.c.result != '')).fetchall()
+    for row in rows:
+        # existing results are JSON already, they are only compressed
+        connection.execute(result.update().where(result.c.id == row.id).values(
+            result_data=zlib.compress(row.result.encode('utf-8')), result_format='json-zlib'))
+
+    with op.batch_alter_table('result') as batch_op:
+        batch_op.drop_column('result')
+
+
+def downgrade():
+    from app import result_codec
+
+    op.add_column('result', sa.Column('result', sa.String(length=1200), nullable=True))
+
+    connection = op.get_bind()
+    rows = connection.execute(sa.select([result.c.id, result.c.result_data, result.c.result_format])
+                              .where(result.c.result_data.isnot(None))).fetchall()
+    for row in rows:
+        connection.execute(result.update().where(result.c.id == row.id).values(
+            result=json.dumps(result_codec.decode(row.result_format, row.result_data))))
+
+    with op.batch_alter_table('result') as batch_op:
+        batch_op.drop_column('result_format')
+        batch_op.drop_column('result_data')
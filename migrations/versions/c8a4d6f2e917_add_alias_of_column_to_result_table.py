@@ -0,0 +1,25 @@
+"""add alias_of column to result table
+
+Revision ID: c8a4d6f2e917
+Revises: b5e1f3a8d240
+Create Date: 2026-10-17 11:26:50.274891
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8a4d6f2e917'
+down_revision = 'b5e1f3a8d240'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('result', sa.Column('alias_of', sa.String(length=36), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('result') as batch_op:
+        batch_op.drop_column('alias_of')
@@ -0,0 +1,25 @@
+"""add timings column to result table
+
+Revision ID: d3b7f1a9c5e4
+Revises: c8a4d6f2e917
+Create Date: 2026-10-17 14:02:31.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3b7f1a9c5e4'
+down_revision = 'c8a4d6f2e917'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('result', sa.Column('timings', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('result') as batch_op:
+        batch_op.drop_column('timings')
@@ -0,0 +1,30 @@
+"""add profile table
+
+Revision ID: e6c2a8d4f1b3
+Revises: d3b7f1a9c5e4
+Create Date: 2026-10-17 16:41:09.274631
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6c2a8d4f1b3'
+down_revision = 'd3b7f1a9c5e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('profile',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('stats', sa.LargeBinary(), nullable=True),
+    sa.Column('report', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('profile')